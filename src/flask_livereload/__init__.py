@@ -6,35 +6,340 @@ A Flask extension that provides live reloading of web pages when template or
 static files change.
 """
 
-import os
-import queue
+import json
+import html
 import logging
-import atexit
-import fnmatch
-from typing import Optional, List
-from flask import Flask
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileSystemEvent
+import weakref
+from typing import Any, Callable, Iterable, Optional
+from flask import Flask, current_app, g, has_app_context, template_rendered
+
+from .cli import livereload_cli
+from .events import MODIFIED
+from .state import AppState
 
 logger = logging.getLogger(__name__)
 
 # JavaScript to be injected into the browser
 LIVERELOAD_SCRIPT = b"""
-<script>
+<script data-livereload-config="__LIVERELOAD_CONFIG__">
 (function() {
     if (!window.EventSource) {
         console.warn("EventSource not supported, LiveReload disabled");
         return;
     }
-    var source = new EventSource("/_livereload");
+    // Tell the server a staggered reload finished so it can send the next
+    // wave.
+    var ACK_KEY = "livereload:ack";
+    var ackClient = null;
+    try {
+        ackClient = window.sessionStorage.getItem(ACK_KEY);
+        window.sessionStorage.removeItem(ACK_KEY);
+    } catch (e) {}
+    var sendAck = function(client) {
+        fetch("/_livereload/ack", {
+            method: "POST",
+            headers: {"Content-Type": "application/json"},
+            body: JSON.stringify({client: client}),
+            keepalive: true
+        }).catch(function() {});
+    };
+    if (ackClient) {
+        if (document.readyState === "complete") {
+            sendAck(ackClient);
+        } else {
+            window.addEventListener("load", function() {
+                sendAck(ackClient);
+            });
+        }
+    }
+    var script = document.currentScript;
+    var config = JSON.parse(
+        (script && script.getAttribute("data-livereload-config")) || "{}"
+    );
+    // Keep scroll position and form input across reloads. Elements inside
+    // [data-livereload-ignore] are left alone.
+    var STATE_KEY = "livereload:state:" + window.location.pathname +
+        window.location.search;
+    var fieldKeys = function() {
+        var fields = document.querySelectorAll("input, textarea, select");
+        var counts = {};
+        var result = [];
+        Array.prototype.forEach.call(fields, function(field) {
+            if (field.closest("[data-livereload-ignore]") ||
+                    field.type === "password" || field.type === "file" ||
+                    field.type === "hidden") {
+                return;
+            }
+            var key = field.tagName + ":" + (field.id || field.name || "");
+            counts[key] = (counts[key] || 0) + 1;
+            result.push([key + ":" + counts[key], field]);
+        });
+        return result;
+    };
+    var saveState = function() {
+        var fields = {};
+        fieldKeys().forEach(function(entry) {
+            var field = entry[1];
+            if (field.type === "checkbox" || field.type === "radio") {
+                fields[entry[0]] = field.checked;
+            } else if (field.multiple) {
+                fields[entry[0]] = Array.prototype.map.call(
+                    field.selectedOptions, function(option) {
+                        return option.value;
+                    }
+                );
+            } else {
+                fields[entry[0]] = field.value;
+            }
+        });
+        try {
+            window.sessionStorage.setItem(STATE_KEY, JSON.stringify({
+                x: window.scrollX, y: window.scrollY, fields: fields
+            }));
+        } catch (e) {}
+    };
+    var restoreState = function() {
+        var saved = null;
+        try {
+            saved = JSON.parse(window.sessionStorage.getItem(STATE_KEY));
+            window.sessionStorage.removeItem(STATE_KEY);
+        } catch (e) {}
+        if (!saved) {
+            return;
+        }
+        fieldKeys().forEach(function(entry) {
+            var field = entry[1];
+            if (!saved.fields.hasOwnProperty(entry[0])) {
+                return;
+            }
+            var value = saved.fields[entry[0]];
+            if (field.type === "checkbox" || field.type === "radio") {
+                field.checked = value;
+            } else if (field.multiple) {
+                Array.prototype.forEach.call(field.options, function(option) {
+                    option.selected = value.indexOf(option.value) !== -1;
+                });
+            } else {
+                field.value = value;
+            }
+        });
+        var scroll = function() {
+            if (!document.body.closest("[data-livereload-ignore]")) {
+                window.scrollTo(saved.x, saved.y);
+            }
+        };
+        if (document.readyState === "complete") {
+            scroll();
+        } else {
+            window.addEventListener("load", scroll);
+        }
+    };
+    if (config.preserveState) {
+        restoreState();
+    }
+    // Updates the live DOM to match a freshly rendered one, keeping nodes
+    // that did not change (and with them focus, input and listeners).
+    var isSameNode = function(a, b) {
+        if (a.nodeType !== b.nodeType || a.nodeName !== b.nodeName) {
+            return false;
+        }
+        return a.nodeType !== 1 || !a.id || !b.id || a.id === b.id;
+    };
+    var morphAttributes = function(from, to) {
+        var i, attr;
+        for (i = from.attributes.length - 1; i >= 0; i--) {
+            attr = from.attributes[i];
+            if (!to.hasAttribute(attr.name)) {
+                from.removeAttribute(attr.name);
+            }
+        }
+        for (i = 0; i < to.attributes.length; i++) {
+            attr = to.attributes[i];
+            if (from.getAttribute(attr.name) !== attr.value) {
+                from.setAttribute(attr.name, attr.value);
+            }
+        }
+    };
+    var morphChildren = function(from, to) {
+        var current = from.firstChild;
+        var next = to.firstChild;
+        while (next) {
+            var following = next.nextSibling;
+            var match = null;
+            if (next.nodeType === 1 && next.id) {
+                match = document.getElementById(next.id);
+                if (match && match.parentNode !== from) {
+                    match = null;
+                }
+            }
+            if (!match && current && isSameNode(current, next)) {
+                match = current;
+            }
+            if (match) {
+                if (match !== current) {
+                    from.insertBefore(match, current);
+                } else {
+                    current = current.nextSibling;
+                }
+                morphNode(match, next);
+            } else {
+                from.insertBefore(document.importNode(next, true), current);
+            }
+            next = following;
+        }
+        while (current) {
+            var stale = current;
+            current = current.nextSibling;
+            from.removeChild(stale);
+        }
+    };
+    var morphNode = function(from, to) {
+        if (from.nodeType !== 1) {
+            if (from.nodeValue !== to.nodeValue) {
+                from.nodeValue = to.nodeValue;
+            }
+            return;
+        }
+        if (from.hasAttribute("data-livereload-ignore")) {
+            return;
+        }
+        morphAttributes(from, to);
+        if (from.nodeName !== "TEXTAREA") {
+            morphChildren(from, to);
+        }
+    };
+    var morph = function() {
+        return fetch(window.location.href, {
+            headers: {"Accept": "text/html"},
+            credentials: "same-origin"
+        }).then(function(response) {
+            var type = response.headers.get("Content-Type") || "";
+            if (!response.ok || type.indexOf("text/html") !== 0) {
+                throw new Error("Cannot morph a " + response.status + " response");
+            }
+            return response.text();
+        }).then(function(text) {
+            var doc = new DOMParser().parseFromString(text, "text/html");
+            document.title = doc.title;
+            morphAttributes(document.body, doc.body);
+            morphChildren(document.body, doc.body);
+        });
+    };
+    // Report the files this page uses so the server only notifies us about
+    // changes that affect it.
+    var params = [];
+    (config.templates || []).forEach(function(name) {
+        params.push("template=" + encodeURIComponent(name));
+    });
+    var assets = document.querySelectorAll(
+        "link[href], script[src], img[src], source[src]"
+    );
+    Array.prototype.forEach.call(assets, function(node) {
+        var url = new URL(node.href || node.src, window.location.href);
+        if (url.origin === window.location.origin) {
+            params.push("asset=" + encodeURIComponent(url.pathname));
+        }
+    });
+    var source = new EventSource(
+        "/_livereload" + (params.length ? "?" + params.join("&") : "")
+    );
     source.onmessage = function(event) {
-        if (event.data === "reload") {
-            console.info("LiveReload: Reloading page...");
-            window.location.reload();
-        } else if (event.data === "connected") {
+        if (event.data === "connected") {
             console.info("LiveReload: Connected to server");
         }
     };
+    var reload = function(batch) {
+        if (batch.client) {
+            try {
+                window.sessionStorage.setItem(ACK_KEY, batch.client);
+            } catch (e) {}
+        }
+        if (config.preserveState) {
+            saveState();
+        }
+        window.location.reload();
+    };
+    // Swaps changed stylesheets without reloading; if none of the page's
+    // stylesheets has the changed file's name, all of them are refreshed.
+    var swapStylesheets = function(changes) {
+        var names = changes.map(function(change) {
+            return (change.dest_path || change.path).split(/[\\\\/]/).pop();
+        });
+        var links = Array.prototype.filter.call(
+            document.querySelectorAll('link[rel="stylesheet"][href]'),
+            function(link) {
+                return new URL(link.href).origin === window.location.origin;
+            }
+        );
+        var matched = links.filter(function(link) {
+            var name = new URL(link.href).pathname.split("/").pop();
+            return names.indexOf(name) !== -1;
+        });
+        (matched.length ? matched : links).forEach(function(link) {
+            var url = new URL(link.href);
+            url.searchParams.set("livereload", Date.now());
+            var swapped = link.cloneNode();
+            swapped.href = url.href;
+            var remove = function() {
+                if (link.parentNode) {
+                    link.parentNode.removeChild(link);
+                }
+            };
+            swapped.addEventListener("load", remove);
+            swapped.addEventListener("error", remove);
+            link.parentNode.insertBefore(swapped, link.nextSibling);
+        });
+    };
+    // Runs the actions of changes that do not need a reload.
+    var applyActions = function(changes) {
+        var stylesheets = changes.filter(function(change) {
+            return change.action === "css";
+        });
+        if (stylesheets.length) {
+            swapStylesheets(stylesheets);
+        }
+        changes.forEach(function(change) {
+            if (change.action && change.action.indexOf("event:") === 0) {
+                document.dispatchEvent(new CustomEvent(
+                    change.action.slice(6), {detail: change}
+                ));
+            }
+        });
+    };
+    source.addEventListener("reload", function(event) {
+        var batch = JSON.parse(event.data);
+        // A stale batch means the server dropped changes for this page.
+        var reloads = batch.stale || batch.changes.some(function(change) {
+            return !change.action;
+        });
+        console.info(
+            "LiveReload: " + (reloads ? "Reloading page" : "Updating page") +
+            " (#" + batch.seq + ", " + batch.changes.length +
+            " changed file(s))...",
+            batch.changes
+        );
+        var done = function() {
+            applyActions(batch.changes);
+            if (batch.client) {
+                sendAck(batch.client);
+            }
+        };
+        setTimeout(function() {
+            if (!reloads) {
+                done();
+            } else if (batch.morph && !batch.stale) {
+                morph().then(function() {
+                    console.info("LiveReload: Page updated in place");
+                    done();
+                }, function(error) {
+                    console.warn("LiveReload: Morphing failed, reloading", error);
+                    reload(batch);
+                });
+            } else {
+                reload(batch);
+            }
+        }, batch.delay || 0);
+    });
     source.onerror = function(event) {
         console.warn("LiveReload connection error:", event);
     };
@@ -48,79 +353,56 @@ LIVERELOAD_SCRIPT = b"""
 """
 
 
-class _ChangeHandler(FileSystemEventHandler):
-    """Handles file system events and puts a 'reload' message in the queue."""
+class LiveReload:
+    """
+    This class controls the Flask-LiveReload extension.
+
+    One instance can serve several applications: each ``init_app`` call
+    keeps its own state in ``app.extensions["livereload"]`` while all of them
+    share a single file system observer.
+
+    Everything is released at interpreter exit. Code that builds many
+    applications, such as test suites, should release them explicitly with
+    :meth:`close`, by using the instance as a context manager, or by passing
+    a ``teardown`` hook to :meth:`init_app`.
+    """
 
     def __init__(
         self,
-        change_queue: queue.Queue,
-        watch_patterns: List[str],
-        ignore_patterns: List[str],
+        app: Optional[Flask] = None,
+        teardown: Optional[Callable[[Callable[[], None]], Any]] = None,
     ):
-        super().__init__()
-        self.change_queue = change_queue
-        self.watch_patterns = watch_patterns
-        self.ignore_patterns = ignore_patterns
-
-    def _is_watched(self, path: str) -> bool:
-        """Check if a file path matches the watch/ignore patterns."""
-        for pattern in self.ignore_patterns:
-            if fnmatch.fnmatch(path, pattern):
-                return False
-
-        if not self.watch_patterns:
-            return True
-
-        for pattern in self.watch_patterns:
-            if fnmatch.fnmatch(path, pattern):
-                return True
-        return False
-
-    def _dispatch(self, event: FileSystemEvent):
-        """Dispatch events to the queue if they match watched patterns."""
-        if event.is_directory:
-            return
-
-        # For moved events, the destination path is what matters.
-        path = event.src_path
-
-        if self._is_watched(path):
-            logger.info(
-                f"File change detected ({event.event_type} on {path}), triggering reload."
-            )
-            self.change_queue.put("reload")
-        else:
-            logger.debug(f"Ignored file change ({event.event_type} on {path}).")
-
-    def on_modified(self, event: FileSystemEvent):
-        self._dispatch(event)
-
-    def on_created(self, event: FileSystemEvent):
-        self._dispatch(event)
+        self.app = app
+        self._states: "weakref.WeakSet[AppState]" = weakref.WeakSet()
+        if app is not None:
+            self.init_app(app, teardown)
 
-    def on_moved(self, event: FileSystemEvent):
-        self._dispatch(event)
+    def __enter__(self) -> "LiveReload":
+        return self
 
+    def __exit__(self, *exc_info):
+        self.close()
 
-class LiveReload:
-    """
-    This class controls the Flask-LiveReload extension.
-    """
+    def init_app(
+        self,
+        app: Flask,
+        teardown: Optional[Callable[[Callable[[], None]], Any]] = None,
+    ):
+        """
+        Initializes the extension with the given application.
 
-    def __init__(self, app: Optional[Flask] = None):
-        self.app = app
-        self.change_queue: queue.Queue[str] = queue.Queue()
-        self.observer = None
-        if app is not None:
-            self.init_app(app)
+        ``teardown`` registers a callback that stops this application, such
+        as ``request.addfinalizer`` in a pytest fixture or
+        ``ExitStack.callback``.
+        """
+        # The CLI only talks to a running server over HTTP, so it is
+        # available even where the extension itself is disabled.
+        app.cli.add_command(livereload_cli)
 
-    def init_app(self, app: Flask):
-        """Initializes the extension with the given application."""
         if not app.debug:
             logger.info("Flask-LiveReload disabled: app not in debug mode.")
             return
 
-        self.app = app
         app.config.setdefault("LIVERELOAD_WATCH_PATTERNS", ["*.html", "*.css", "*.js"])
         app.config.setdefault(
             "LIVERELOAD_IGNORE_PATTERNS",
@@ -134,52 +416,124 @@ class LiveReload:
                 "*.log",
             ],
         )
-        app.extensions["livereload"] = self
+        app.config.setdefault("LIVERELOAD_WATCH", True)
+        app.config.setdefault("LIVERELOAD_USE_GITIGNORE", False)
+        app.config.setdefault("LIVERELOAD_DEBOUNCE", 0.1)
+        app.config.setdefault("LIVERELOAD_MAX_PENDING_EVENTS", 10000)
+        app.config.setdefault("LIVERELOAD_SHUTDOWN_TIMEOUT", 2.0)
+        app.config.setdefault("LIVERELOAD_MAX_SUBSCRIBERS", None)
+        app.config.setdefault("LIVERELOAD_SUBSCRIBER_BUFFER", 1000)
+        app.config.setdefault("LIVERELOAD_CLIENT_TIMEOUT", 60)
+        app.config.setdefault("LIVERELOAD_KEEPALIVE", 30)
+        app.config.setdefault("LIVERELOAD_PREWARM_TEMPLATES", False)
+        app.config.setdefault("LIVERELOAD_WAVE_SIZE", None)
+        app.config.setdefault("LIVERELOAD_WAVE_TIMEOUT", 5.0)
+        app.config.setdefault("LIVERELOAD_RELOAD_JITTER", 0)
+        app.config.setdefault("LIVERELOAD_PRESERVE_STATE", True)
+        app.config.setdefault("LIVERELOAD_MORPH", False)
+        app.config.setdefault("LIVERELOAD_HEALTH_INTERVAL", None)
+        app.config.setdefault("LIVERELOAD_HEALTH_TIMEOUT", 2.0)
+        app.config.setdefault("LIVERELOAD_RULES", [])
+        app.config.setdefault("LIVERELOAD_BUILD_SETTLE", 1.0)
+        state = AppState(app)
+        app.extensions["livereload"] = state
+        self._states.add(state)
+        if teardown is not None:
+            teardown(state.stop)
 
         from .views import livereload_bp
 
         app.register_blueprint(livereload_bp)
 
         app.after_request(self.inject_script)
+        try:
+            template_rendered.connect(self._record_template, app)
+        except RuntimeError:
+            # Flask < 2.3 without blinker: pages subscribe to every change.
+            logger.debug("Signals unavailable, template tracking disabled.")
 
-        self.start_watcher()
-        atexit.register(self.stop_watcher)
+        state.start()
 
         logger.info("Flask-LiveReload initialized successfully.")
 
-    def start_watcher(self):
-        """Starts the file system observer."""
-        if self.observer and self.observer.is_alive():
+    def _get_state(self, app: Optional[Flask] = None) -> AppState:
+        """
+        The state of ``app``, else of the current application, else of the
+        only application this instance was initialized with.
+        """
+        if app is None:
+            app = current_app._get_current_object() if has_app_context() else self.app
+        if app is None:
+            states = list(self._states)
+            if len(states) > 1:
+                raise RuntimeError(
+                    "Flask-LiveReload is initialized with several applications; "
+                    "pass app= or call this inside an application context."
+                )
+            if states:
+                return states[0]
+        if app is None or "livereload" not in app.extensions:
+            raise RuntimeError("Flask-LiveReload is not running for this app.")
+        return app.extensions["livereload"]
+
+    def start_watcher(self, app: Optional[Flask] = None):
+        """Starts watching the application's template and static folders."""
+        self._get_state(app).start()
+
+    def stop_watcher(self, app: Optional[Flask] = None):
+        """
+        Stops watching for the given application, or for every application
+        this instance was initialized with when called outside an app context
+        without one.
+        """
+        if app is None and not has_app_context():
+            for state in list(self._states):
+                state.stop()
             return
-
-        self.observer = Observer()
-        watch_patterns = self.app.config["LIVERELOAD_WATCH_PATTERNS"]
-        ignore_patterns = self.app.config["LIVERELOAD_IGNORE_PATTERNS"]
-
-        handler = _ChangeHandler(self.change_queue, watch_patterns, ignore_patterns)
-
-        paths_to_watch = set()
-        if self.app.template_folder:
-            paths_to_watch.add(os.path.abspath(self.app.template_folder))
-        if self.app.static_folder:
-            paths_to_watch.add(os.path.abspath(self.app.static_folder))
-
-        logger.info(f"Watching paths: {list(paths_to_watch)}")
-        logger.info(f"Watch patterns: {watch_patterns}")
-        logger.info(f"Ignore patterns: {ignore_patterns}")
-
-        for path in paths_to_watch:
-            if os.path.exists(path):
-                self.observer.schedule(handler, path, recursive=True)
-
-        self.observer.start()
-
-    def stop_watcher(self):
-        """Stops the file system observer."""
-        if self.observer and self.observer.is_alive():
-            self.observer.stop()
-            self.observer.join()
-            logger.info("Flask-LiveReload watcher stopped.")
+        self._get_state(app).stop()
+
+    def close(self):
+        """
+        Stops every application this instance was initialized with: open
+        ``/_livereload`` streams end immediately, threads are joined within
+        ``LIVERELOAD_SHUTDOWN_TIMEOUT`` and file system watches are released.
+        """
+        states = list(self._states)
+        self._states.clear()
+        for state in states:
+            state.stop()
+
+    def notify(
+        self, paths: Iterable[str], kind: str = MODIFIED, app: Optional[Flask] = None
+    ):
+        """
+        Reports changed files from outside the file watcher, e.g. from a
+        build tool that knows when its output is ready.
+
+        Relative paths are resolved against the application's root path;
+        a single path may be passed as a string. ``kind`` is one of
+        ``"modified"``, ``"created"`` or ``"deleted"``. The changes go
+        through the same normalization, filtering and delivery as the ones
+        the watcher detects. Raises :class:`RuntimeError` if the watcher is
+        not running.
+        """
+        self._get_state(app).notify(paths, kind)
+
+    def health(self, check: bool = False, app: Optional[Flask] = None) -> dict:
+        """
+        Reports whether file events actually arrive for the application's
+        folders, as established by the canary checks that run every
+        ``LIVERELOAD_HEALTH_INTERVAL`` seconds. With ``check``, the folders
+        are checked right away, which blocks for up to
+        ``LIVERELOAD_HEALTH_TIMEOUT`` seconds per folder, plus the time to
+        confirm the polling fallback for a folder that missed its canary.
+        """
+        return self._get_state(app).health(check)
+
+    def _record_template(self, sender: Flask, template, context, **extra):
+        """Remembers which templates were rendered for the current request."""
+        if template.name is not None:
+            g.setdefault("_livereload_templates", []).append(template.name)
 
     def inject_script(self, response):
         """Injects the LiveReload script into HTML responses."""
@@ -189,7 +543,13 @@ class LiveReload:
             content = response.get_data(as_text=True)
             if "</body>" in content and "_livereload" not in content:
                 body_tag = "</body>"
-                script_tag = LIVERELOAD_SCRIPT.decode("utf-8")
+                config = {
+                    "templates": g.get("_livereload_templates", []),
+                    "preserveState": current_app.config["LIVERELOAD_PRESERVE_STATE"],
+                }
+                script_tag = LIVERELOAD_SCRIPT.decode("utf-8").replace(
+                    "__LIVERELOAD_CONFIG__", html.escape(json.dumps(config))
+                )
                 content = content.replace(body_tag, script_tag + body_tag)
                 response.set_data(content)
                 response.headers["Content-Length"] = len(response.get_data())
@@ -0,0 +1,50 @@
+"""
+``flask livereload`` commands.
+"""
+
+import os
+import json
+import urllib.error
+import urllib.request
+
+import click
+from flask.cli import AppGroup
+
+livereload_cli = AppGroup("livereload", help="Flask-LiveReload commands.")
+
+
+@livereload_cli.command("trigger")
+@click.argument("paths", nargs=-1, required=True, type=click.Path())
+@click.option(
+    "--kind",
+    type=click.Choice(["modified", "created", "deleted"]),
+    default="modified",
+    show_default=True,
+    help="What happened to the files.",
+)
+@click.option(
+    "--url",
+    envvar="LIVERELOAD_URL",
+    default="http://127.0.0.1:5000",
+    show_default=True,
+    help="Base URL of the running development server.",
+)
+def trigger(paths, kind, url):
+    """Tell a running server that PATHS changed, e.g. after a build."""
+    body = json.dumps(
+        {"paths": [os.path.abspath(path) for path in paths], "kind": kind}
+    ).encode("utf-8")
+    request = urllib.request.Request(
+        url.rstrip("/") + "/_livereload/notify",
+        data=body,
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            result = json.load(response)
+    except urllib.error.HTTPError as e:
+        raise click.ClickException(f"Server rejected the notification: {e}")
+    except urllib.error.URLError as e:
+        raise click.ClickException(f"Could not reach {url}: {e.reason}")
+    click.echo(f"Notified {result['queued']} change(s).")
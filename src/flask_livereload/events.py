@@ -0,0 +1,150 @@
+"""
+Change records, atomic-save normalization and the SSE wire format used to
+deliver them.
+"""
+
+import os
+import json
+import fnmatch
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+MODIFIED = "modified"
+CREATED = "created"
+MOVED = "moved"
+DELETED = "deleted"
+
+
+class Change(NamedTuple):
+    """A single logical change to a watched file."""
+
+    kind: str
+    path: str
+    dest_path: Optional[str] = None
+
+    @property
+    def paths(self) -> Tuple[str, ...]:
+        """Every path touched by the change (source and destination)."""
+        if self.dest_path is None:
+            return (self.path,)
+        return (self.path, self.dest_path)
+
+    def to_dict(self) -> Dict[str, str]:
+        data = {"type": self.kind, "path": self.path}
+        if self.dest_path is not None:
+            data["dest_path"] = self.dest_path
+        return data
+
+
+# Scratch files editors create while saving. Events on these never reach the
+# browser; they only tell the normalizer what the editor is doing.
+TEMPORARY_FILE_PATTERNS = {
+    "vim": ["4913", "*.swp", "*.swx", "*.swo", "*~"],
+    "emacs": [".#*", "#*#", "*~"],
+    "jetbrains": ["*___jb_tmp___", "*___jb_old___"],
+    "gedit": [".goutputstream-*"],
+    "kate": ["*.kate-swp"],
+    "generic": ["*.tmp"],
+}
+
+
+def is_temporary(path: str) -> bool:
+    """Whether ``path`` looks like an editor's swap, backup or temp file."""
+    name = os.path.basename(path)
+    return any(
+        fnmatch.fnmatch(name, pattern)
+        for patterns in TEMPORARY_FILE_PATTERNS.values()
+        for pattern in patterns
+    )
+
+
+def normalize(raw: Iterable[Change]) -> List[Change]:
+    """
+    Folds a burst of raw file system events into logical changes.
+
+    Editors rarely write a file in place. Vim renames the original to a
+    backup and writes a new file, JetBrains IDEs write a temp file and
+    rename it over the original, and so on. Whatever the sequence, the
+    result is reported as one change per real file:
+
+    * events on temporary files are dropped, except that a temp file moved
+      onto a real one counts as modifying it;
+    * a file that is deleted (or moved away) and then recreated was modified;
+    * a file created and deleted within the burst never existed.
+
+    Changes are returned in the order their files were first touched.
+    """
+    states: Dict[str, Change] = {}
+    removed = set()
+
+    def touch(path: str, kind: str):
+        previous = states.get(path)
+        if kind == DELETED:
+            if previous is not None and previous.kind == CREATED:
+                del states[path]
+                return
+            removed.add(path)
+            if previous is not None and previous.kind == MOVED:
+                # Renamed and then deleted: the original file is what's gone.
+                states[path] = Change(DELETED, previous.path)
+                return
+        elif path in removed:
+            removed.discard(path)
+            kind = MODIFIED
+        elif previous is not None:
+            return
+        states[path] = Change(kind, path)
+
+    for change in raw:
+        src_temporary = is_temporary(change.path)
+        if change.kind == MOVED:
+            dest_temporary = is_temporary(change.dest_path)
+            if src_temporary and dest_temporary:
+                continue
+            if src_temporary:
+                touch(change.dest_path, MODIFIED)
+            elif dest_temporary:
+                touch(change.path, DELETED)
+            else:
+                previous = states.pop(change.path, None)
+                states.pop(change.dest_path, None)
+                removed.discard(change.dest_path)
+                if previous is not None and previous.kind == CREATED:
+                    touch(change.dest_path, CREATED)
+                else:
+                    removed.add(change.path)
+                    states[change.dest_path] = change
+        elif not src_temporary:
+            touch(change.path, change.kind)
+
+    return list(states.values())
+
+
+def encode_batch(
+    seq: int,
+    changes: Iterable[Change],
+    actions: Optional[Callable[[Change], str]] = None,
+    event_id: Optional[str] = None,
+    **extra,
+) -> str:
+    """
+    Encodes a batch of changes as one SSE ``reload`` event.
+
+    Duplicate changes are dropped while keeping their first-seen order, and
+    the JSON is emitted without whitespace to keep the frame small. With
+    ``actions``, each change carries the action it maps to unless that is a
+    plain ``"reload"``. The SSE id defaults to ``seq``. Extra keyword
+    arguments are added to the payload as is.
+    """
+    unique: List[Change] = list(dict.fromkeys(changes))
+    entries = []
+    for change in unique:
+        entry = change.to_dict()
+        if actions is not None:
+            action = actions(change)
+            if action != "reload":
+                entry["action"] = action
+        entries.append(entry)
+    payload = {"seq": seq, "changes": entries}
+    payload.update(extra)
+    data = json.dumps(payload, separators=(",", ":"))
+    return f"id: {event_id or seq}\nevent: reload\ndata: {data}\n\n"
@@ -0,0 +1,51 @@
+"""
+Watcher self-test.
+
+Native file notifications can fail silently: the inotify watch limit is
+reached, or the folder is a bind mount or on a network file system. The
+extension would then start fine and simply never reload. With
+``LIVERELOAD_HEALTH_INTERVAL`` set, :class:`HealthMonitor` periodically writes
+a canary file in each watched root (see :meth:`_ObserverRegistry.check`);
+roots whose canary does not arrive within ``LIVERELOAD_HEALTH_TIMEOUT`` are
+switched to polling.
+"""
+
+import logging
+import threading
+from typing import Callable, Iterable
+
+from .observer import registry
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor(threading.Thread):
+    """Checks the given roots every ``interval`` seconds until stopped."""
+
+    def __init__(
+        self, roots: Callable[[], Iterable[str]], interval: float, timeout: float
+    ):
+        super().__init__(name="flask-livereload-health", daemon=True)
+        self.roots = roots
+        self.interval = interval
+        self.timeout = timeout
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            for root in self.roots():
+                if self._stopped.is_set():
+                    return
+                health = registry.check(root, self.timeout)
+                if health is not None and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "Canary for %s: %s",
+                        root,
+                        "ok" if health.ok else "missed",
+                        extra={"path": root, "latency_ms": health.latency_ms},
+                    )
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        """Asks the monitor to exit after the check in progress, if any."""
+        self._stopped.set()
@@ -0,0 +1,225 @@
+"""
+``.gitignore``-aware filtering.
+
+:class:`IgnoreTree` loads the ``.gitignore`` and ``.ignore`` files under the
+watched roots (and those of the enclosing git checkout) into a hierarchical
+matcher with gitignore semantics. It is used twice: to skip events for
+ignored files, and to plan watches so that ignored directories such as
+``node_modules`` are never scheduled at all.
+"""
+
+import os
+import re
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+IGNORE_FILES = (".gitignore", ".ignore")
+
+
+class _Rule(NamedTuple):
+    regex: Pattern
+    negate: bool
+    dir_only: bool
+
+
+def _translate(pattern: str) -> str:
+    """Translates a gitignore glob (without flags) into a regex."""
+    i, n = 0, len(pattern)
+    out = []
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern[i : i + 3] == "**/":
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern[i : i + 2] == "**":
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def parse_rules(lines: Iterable[str]) -> List[_Rule]:
+    """Parses the lines of an ignore file into rules."""
+    rules = []
+    for line in lines:
+        line = line.rstrip("\n").rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        if "/" in line:
+            # Anchored to the directory of the ignore file.
+            regex = _translate(line.lstrip("/"))
+        else:
+            regex = "(?:.*/)?" + _translate(line)
+        rules.append(_Rule(re.compile(regex + r"\Z"), negate, dir_only))
+    return rules
+
+
+def _git_root(path: str) -> Optional[str]:
+    while True:
+        if os.path.exists(os.path.join(path, ".git")):
+            return path
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+class IgnoreTree:
+    """Ignore rules keyed by the directory whose ignore file declared them."""
+
+    def __init__(self, rules: Optional[Dict[str, List[_Rule]]] = None):
+        self.rules: Dict[str, List[_Rule]] = rules or {}
+        self._cache: Dict[Tuple[str, bool], bool] = {}
+
+    @classmethod
+    def load(cls, roots: Iterable[str]) -> "IgnoreTree":
+        """
+        Reads the ignore files under each root, skipping ignored
+        directories, plus those between each root and its git checkout.
+        """
+        tree = cls()
+        for root in roots:
+            root = os.path.abspath(root)
+            git_root = _git_root(root)
+            if git_root is not None:
+                ancestors = []
+                path = os.path.dirname(root)
+                while len(path) >= len(git_root):
+                    ancestors.append(path)
+                    if path == git_root:
+                        break
+                    path = os.path.dirname(path)
+                for path in reversed(ancestors):
+                    tree._read(path)
+
+            for dirpath, dirnames, _ in os.walk(root):
+                tree._read(dirpath)
+                dirnames[:] = [
+                    d
+                    for d in dirnames
+                    if not tree.is_ignored(os.path.join(dirpath, d), is_dir=True)
+                ]
+        return tree
+
+    def _read(self, directory: str):
+        if directory in self.rules:
+            return
+        rules: List[_Rule] = []
+        for name in IGNORE_FILES:
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    rules.extend(parse_rules(f))
+            except OSError:
+                continue
+        if rules:
+            self.rules[directory] = rules
+            self._cache.clear()
+
+    def _match(self, path: str, is_dir: bool) -> bool:
+        """Whether ``path`` itself is matched, ignoring its parents."""
+        ignored = False
+        directory = os.path.dirname(path)
+        # Ignore files nearer the path override those further up.
+        bases = []
+        while True:
+            if directory in self.rules:
+                bases.append(directory)
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+        for base in reversed(bases):
+            relative = os.path.relpath(path, base).replace(os.sep, "/")
+            for rule in self.rules[base]:
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.regex.match(relative):
+                    ignored = not rule.negate
+        return ignored
+
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Whether ``path`` or any of its parent directories is ignored."""
+        if not self.rules:
+            return False
+        key = (path, is_dir)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        parent = os.path.dirname(path)
+        if parent != path and self.is_ignored(parent, is_dir=True):
+            result = True
+        else:
+            result = self._match(path, is_dir)
+        if is_dir:
+            self._cache[key] = result
+        return result
+
+    def watch_plan(self, root: str) -> List[Tuple[str, bool]]:
+        """
+        The ``(directory, recursive)`` watches that cover ``root`` without
+        covering any ignored directory: subtrees free of ignored
+        directories are watched recursively, the rest one level at a time.
+        """
+        root = os.path.abspath(root)
+        ignored: Set[str] = set()
+        children: Dict[str, List[str]] = {}
+        for dirpath, dirnames, _ in os.walk(root):
+            kept = []
+            for d in dirnames:
+                path = os.path.join(dirpath, d)
+                if self.is_ignored(path, is_dir=True):
+                    ignored.add(path)
+                else:
+                    kept.append(path)
+            children[dirpath] = kept
+            dirnames[:] = [os.path.basename(p) for p in kept]
+
+        def has_ignored(directory: str) -> bool:
+            return any(_inside(directory, path) for path in ignored)
+
+        plan: List[Tuple[str, bool]] = []
+        pending = [root]
+        while pending:
+            directory = pending.pop()
+            if not has_ignored(directory):
+                plan.append((directory, True))
+            else:
+                plan.append((directory, False))
+                pending.extend(children.get(directory, ()))
+        return sorted(plan)
+
+
+def _inside(directory: str, path: str) -> bool:
+    return path.startswith(directory + os.sep)
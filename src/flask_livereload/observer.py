@@ -0,0 +1,314 @@
+"""
+Process-wide file system observer shared by every application.
+
+Applications register the directories they care about with :data:`registry`.
+It runs a single watchdog observer, schedules each directory tree only once
+(a root nested inside another registered recursive root rides on the outer
+watch) and routes every event to the applications whose roots contain it.
+
+:meth:`_ObserverRegistry.check` writes a canary file to confirm that events
+for a directory actually arrive. Directories whose canary is missed are moved
+to a polling observer, which works where native notifications do not (watch
+limits, bind mounts, network file systems).
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.api import BaseObserver, ObservedWatch
+from watchdog.observers.polling import PollingObserver
+
+from .worker import _EVENT_KINDS
+
+logger = logging.getLogger(__name__)
+
+CANARY_PREFIX = ".livereload-canary-"
+
+# Seconds between two scans of the polling observer.
+POLL_INTERVAL = 1.0
+
+
+class Health(NamedTuple):
+    """
+    Outcome of the last canary check of a watched directory. ``ok`` is None
+    when the canary could not be written, which says nothing about events;
+    ``error`` then tells why.
+    """
+
+    ok: Optional[bool]
+    latency_ms: Optional[float]
+    polling: bool
+    checked_at: float
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "latency_ms": self.latency_ms,
+            "observer": "polling" if self.polling else "native",
+            "checked_at": self.checked_at,
+            "error": self.error,
+        }
+
+
+def _contains(root: str, path: str) -> bool:
+    return path == root or path.startswith(root + os.sep)
+
+
+def _covers(key: Tuple[str, bool], path: str) -> bool:
+    """Whether a ``(root, recursive)`` watch sees events for ``path``."""
+    root, recursive = key
+    if recursive:
+        return _contains(root, path)
+    return path == root or os.path.dirname(path) == root
+
+
+class Watch:
+    """A registration of one event queue for one directory (tree)."""
+
+    def __init__(self, root: str, sink: "queue.SimpleQueue", recursive: bool = True):
+        self.root = root
+        self.sink = sink
+        self.recursive = recursive
+
+    @property
+    def key(self) -> Tuple[str, bool]:
+        return (self.root, self.recursive)
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    """
+    Hands raw file system events to the worker of every interested app.
+
+    This runs on watchdog's observer thread, so it does nothing but a
+    non-blocking enqueue per app; filtering and fan-out happen on the
+    workers. Only open/close notifications, which fire whenever a file is
+    served, are dropped here to avoid waking the workers for nothing.
+    """
+
+    def __init__(self, registry: "_ObserverRegistry"):
+        super().__init__()
+        self.registry = registry
+
+    def on_any_event(self, event: FileSystemEvent):
+        if event.event_type not in _EVENT_KINDS:
+            return
+        src_path = event.src_path
+        dest_path = getattr(event, "dest_path", None) or src_path
+        if os.path.basename(src_path).startswith(CANARY_PREFIX):
+            arrived = self.registry._canaries.get(src_path)
+            if arrived is not None:
+                arrived.set()
+            return
+        # The roots mapping is replaced, never mutated, so it can be read
+        # without taking the registry lock.
+        targets = set()
+        for key, sinks in self.registry._roots.items():
+            if _covers(key, src_path) or _covers(key, dest_path):
+                targets |= sinks
+        for sink in targets:
+            sink.put(event)
+
+
+class _ObserverRegistry:
+    """Reference-counted roots scheduled on one shared observer."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handler = _ChangeHandler(self)
+        self._observer: Optional[BaseObserver] = None
+        self._polling_observer: Optional[BaseObserver] = None
+        self._roots: Dict[Tuple[str, bool], Set["queue.SimpleQueue"]] = {}
+        # key -> (polled, watch)
+        self._scheduled: Dict[Tuple[str, bool], Tuple[bool, ObservedWatch]] = {}
+        # Keys whose native watch missed a canary and that are polled instead.
+        self._polled: Set[Tuple[str, bool]] = set()
+        self._canaries: Dict[str, threading.Event] = {}
+        self._health: Dict[str, Health] = {}
+
+    @property
+    def observer(self) -> Optional[BaseObserver]:
+        return self._observer
+
+    @property
+    def polling_observer(self) -> Optional[BaseObserver]:
+        return self._polling_observer
+
+    @property
+    def scheduled(self) -> Set[str]:
+        """The directory trees currently scheduled recursively."""
+        return {root for root, recursive in self._scheduled if recursive}
+
+    @property
+    def scheduled_flat(self) -> Set[str]:
+        """The directories currently scheduled without their subdirectories."""
+        return {root for root, recursive in self._scheduled if not recursive}
+
+    @property
+    def polled(self) -> Set[str]:
+        """The scheduled directories that fell back to polling."""
+        return {root for (root, _), (polled, _) in self._scheduled.items() if polled}
+
+    def health(self, root: str) -> Optional[Health]:
+        """The last canary check of ``root``, if it was ever checked."""
+        return self._health.get(os.path.abspath(root))
+
+    def watch(
+        self, root: str, sink: "queue.SimpleQueue", recursive: bool = True
+    ) -> Watch:
+        """
+        Delivers events under ``root`` (or, if not ``recursive``, directly
+        in it) to ``sink`` until unwatched.
+        """
+        watch = Watch(os.path.abspath(root), sink, recursive)
+        with self._lock:
+            roots = {k: set(sinks) for k, sinks in self._roots.items()}
+            roots.setdefault(watch.key, set()).add(sink)
+            self._roots = roots
+            self._reschedule()
+        return watch
+
+    def unwatch(self, watch: Watch, timeout: Optional[float] = None):
+        """
+        Drops a registration; the last one for a root releases its watch.
+        Releasing the last root stops the observer threads, waiting up to
+        ``timeout`` seconds for each to exit.
+        """
+        with self._lock:
+            roots = {k: set(sinks) for k, sinks in self._roots.items()}
+            sinks = roots.get(watch.key)
+            if sinks is None:
+                return
+            sinks.discard(watch.sink)
+            if not sinks:
+                del roots[watch.key]
+            self._roots = roots
+            self._reschedule(timeout)
+
+    def check(self, root: str, timeout: float) -> Optional[Health]:
+        """
+        Writes a canary file in ``root`` and waits up to ``timeout`` seconds
+        for its event. If it does not arrive, the watches covering ``root``
+        are moved to polling and checked again, which takes up to two poll
+        intervals more; if it cannot be written, they are left alone.
+        Returns None if nothing covers ``root``.
+        """
+        root = os.path.abspath(root)
+        name = f"{CANARY_PREFIX}{os.getpid()}-{threading.get_ident()}"
+        path = os.path.join(root, name)
+        with self._lock:
+            covering = {key for key in self._scheduled if _covers(key, path)}
+            if not covering:
+                return None
+            polling = covering <= self._polled
+            arrived = self._canaries[path] = threading.Event()
+
+        started = time.monotonic()
+        try:
+            with open(path, "w") as f:
+                f.write(str(started))
+        except OSError as e:
+            self._canaries.pop(path, None)
+            logger.warning(
+                "Could not write canary in %s: %s", root, e, extra={"path": root}
+            )
+            health = Health(None, None, polling, time.time(), str(e))
+            self._health[root] = health
+            return health
+        ok = arrived.wait(timeout)
+        latency = (time.monotonic() - started) * 1000 if ok else None
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        self._canaries.pop(path, None)
+
+        if not ok and not polling:
+            logger.warning(
+                "No file events from %s within %.1fs, switching to polling.",
+                root,
+                timeout,
+                extra={"path": root},
+            )
+            with self._lock:
+                self._polled |= covering
+                self._reschedule()
+            # Report on the fallback rather than on the watch it replaced.
+            return self.check(root, max(timeout, 2 * POLL_INTERVAL))
+        health = Health(ok, latency, polling, time.time())
+        self._health[root] = health
+        return health
+
+    def _reschedule(self, timeout: Optional[float] = None):
+        """Schedules exactly the roots not covered by a recursive root."""
+        recursive_roots = [root for root, recursive in self._roots if recursive]
+        wanted = {
+            (root, recursive)
+            for root, recursive in self._roots
+            if not any(
+                _contains(other, root) and (other != root or not recursive)
+                for other in recursive_roots
+            )
+        }
+        self._polled &= wanted
+        self._health = {
+            root: health
+            for root, health in self._health.items()
+            if any(_covers(key, root) for key in wanted)
+        }
+
+        # Schedule outer roots (and polled replacements) before dropping the
+        # watches they replace so no event falls in between.
+        stale = []
+        for key in wanted:
+            polled = key in self._polled
+            current = self._scheduled.get(key)
+            if current is not None and current[0] == polled:
+                continue
+            root, recursive = key
+            observer = self._start(polled)
+            watch = observer.schedule(self._handler, root, recursive=recursive)
+            self._scheduled[key] = (polled, watch)
+            if current is not None:
+                stale.append(current)
+        for key in set(self._scheduled) - wanted:
+            stale.append(self._scheduled.pop(key))
+        for polled, watch in stale:
+            observer = self._polling_observer if polled else self._observer
+            observer.unschedule(watch)
+
+        in_use = {polled for polled, _ in self._scheduled.values()}
+        if False not in in_use and self._observer is not None:
+            self._stop(self._observer, timeout)
+            self._observer = None
+        if True not in in_use and self._polling_observer is not None:
+            self._stop(self._polling_observer, timeout)
+            self._polling_observer = None
+
+    def _start(self, polled: bool) -> BaseObserver:
+        if polled:
+            if self._polling_observer is None:
+                self._polling_observer = PollingObserver(timeout=POLL_INTERVAL)
+                self._polling_observer.start()
+            return self._polling_observer
+        if self._observer is None:
+            self._observer = Observer()
+            self._observer.start()
+        return self._observer
+
+    def _stop(self, observer: BaseObserver, timeout: Optional[float]):
+        observer.stop()
+        observer.join(timeout)
+        if observer.is_alive():
+            logger.warning("Flask-LiveReload watcher did not stop in time.")
+        else:
+            logger.info("Flask-LiveReload watcher stopped.")
+
+
+registry = _ObserverRegistry()
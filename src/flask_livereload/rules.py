@@ -0,0 +1,99 @@
+"""
+Per-path reload rules.
+
+``LIVERELOAD_RULES`` maps file patterns to what a change should do, instead
+of always reloading the page::
+
+    app.config["LIVERELOAD_RULES"] = [
+        ("*.css", "css"),                         # swap the stylesheet in place
+        ("templates/mail/*", "evict"),            # only drop the cached template
+        ("static/dist/*", "build"),               # reload once the build is done
+        ("static/*.map", "ignore"),
+        ("templates/cart/*", "event:cart-changed"),  # let the page handle it
+    ]
+
+Patterns are matched against paths relative to the application's root path
+(``*`` also matches ``/``) and the first matching rule wins; unmatched files
+reload the page. :class:`Router` compiles all patterns into one regular
+expression when the application starts.
+"""
+
+import os
+import re
+import fnmatch
+from typing import Dict, Iterable, Tuple
+
+from .events import Change, CREATED, MODIFIED
+
+RELOAD = "reload"
+CSS = "css"
+EVICT = "evict"
+BUILD = "build"
+IGNORE = "ignore"
+EVENT_PREFIX = "event:"
+
+ACTIONS = (RELOAD, CSS, EVICT, BUILD, IGNORE)
+
+# Stylesheets can only be swapped in place while their URL stays the same.
+_SWAPPABLE = (MODIFIED, CREATED)
+
+
+class Router:
+    """Picks the action for each change from the configured rules."""
+
+    def __init__(self, root_path: str, rules: Iterable[Tuple[str, str]] = ()):
+        self.root_path = os.path.abspath(root_path)
+        self.actions = []
+        groups = []
+        for i, (pattern, action) in enumerate(rules):
+            if action not in ACTIONS and not (
+                action.startswith(EVENT_PREFIX) and len(action) > len(EVENT_PREFIX)
+            ):
+                raise ValueError(
+                    f"Unknown LiveReload action {action!r} for {pattern!r}"
+                )
+            self.actions.append(action)
+            groups.append(f"(?P<r{i}>{fnmatch.translate(pattern)})")
+        self._regex = re.compile("|".join(groups)) if groups else None
+        self._cache: Dict[str, str] = {}
+
+    def _relative(self, path: str) -> str:
+        if path.startswith(self.root_path + os.sep):
+            path = path[len(self.root_path) + 1 :]
+        return path.replace(os.sep, "/")
+
+    def action_for(self, path: str) -> str:
+        """The action of the first rule matching ``path``."""
+        action = self._cache.get(path)
+        if action is None:
+            action = RELOAD
+            if self._regex is not None:
+                match = self._regex.match(self._relative(path))
+                if match is not None:
+                    action = self.actions[int(match.lastgroup[1:])]
+            self._cache[path] = action
+        return action
+
+    def holds(self, path: str) -> bool:
+        """Whether changes to ``path`` wait for the build to settle."""
+        return self._regex is not None and self.action_for(path) == BUILD
+
+    def ignores(self, path: str) -> bool:
+        return self._regex is not None and self.action_for(path) == IGNORE
+
+    def action(self, change: Change) -> str:
+        """
+        The cheapest action that is still correct for ``change``: a
+        stylesheet that was deleted or renamed needs a reload, and so does
+        build output once the build settled.
+        """
+        action = self.action_for(change.dest_path or change.path)
+        if action == CSS and change.kind not in _SWAPPABLE:
+            return RELOAD
+        if action == BUILD:
+            return RELOAD
+        return action
+
+    @property
+    def has_rules(self) -> bool:
+        return self._regex is not None
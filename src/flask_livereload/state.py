@@ -0,0 +1,301 @@
+"""
+Per-application state of the extension.
+
+One :class:`LiveReload` instance can be initialized with several
+applications (application factories, ``DispatcherMiddleware``), so everything
+tied to an application lives here and is stored in
+``app.extensions["livereload"]``.
+"""
+
+import os
+import time
+import queue
+import atexit
+import logging
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileModifiedEvent
+
+from .events import Change, CREATED, DELETED, MODIFIED
+from .health import HealthMonitor
+from .ignore import IgnoreTree
+from .observer import Watch, registry
+from .rules import EVICT, Router
+from .subscribers import Subscriber, SubscriberIndex
+from .templates import TemplatePrewarmer, evict_templates, template_name
+from .waves import WaveBroadcaster
+from .worker import ChangeWorker
+
+logger = logging.getLogger(__name__)
+
+_NOTIFY_EVENTS = {
+    MODIFIED: FileModifiedEvent,
+    CREATED: FileCreatedEvent,
+    DELETED: FileDeletedEvent,
+}
+
+# States with a running worker, stopped at interpreter exit. Weak references
+# so that applications a test suite is done with can be collected.
+_running: "weakref.WeakSet[AppState]" = weakref.WeakSet()
+
+
+@atexit.register
+def _stop_all():
+    for state in list(_running):
+        state.stop()
+
+
+class AppState:
+    """Subscribers, change worker and watches of one application."""
+
+    def __init__(self, app: Flask):
+        self.app = app
+        self.subscribers = SubscriberIndex(app.config["LIVERELOAD_MAX_SUBSCRIBERS"])
+        self.worker: Optional[ChangeWorker] = None
+        self.watches: List[Watch] = []
+        self.ignore_tree: Optional[IgnoreTree] = None
+        self.monitor: Optional[HealthMonitor] = None
+        self.router: Optional[Router] = None
+        self.waves = WaveBroadcaster(
+            app.config["LIVERELOAD_WAVE_SIZE"], app.config["LIVERELOAD_WAVE_TIMEOUT"]
+        )
+        self.prewarmer: Optional[TemplatePrewarmer] = None
+        if app.config["LIVERELOAD_PREWARM_TEMPLATES"]:
+            self.prewarmer = TemplatePrewarmer(app)
+
+    @property
+    def running(self) -> bool:
+        """Whether the change worker is up and changes are being delivered."""
+        return self.worker is not None and self.worker.is_alive()
+
+    @property
+    def roots(self) -> List[str]:
+        """The existing template and static folders of the application."""
+        paths_to_watch = set()
+        if self.app.template_folder:
+            paths_to_watch.add(
+                os.path.normpath(
+                    os.path.join(self.app.root_path, self.app.template_folder)
+                )
+            )
+        if self.app.static_folder:
+            paths_to_watch.add(os.path.abspath(self.app.static_folder))
+        return sorted(path for path in paths_to_watch if os.path.exists(path))
+
+    def start(self):
+        """
+        Starts the change worker and, unless ``LIVERELOAD_WATCH`` is off,
+        registers the application's folders with the shared observer.
+        """
+        if self.running:
+            return
+
+        config = self.app.config
+        if config["LIVERELOAD_CLIENT_TIMEOUT"] <= config["LIVERELOAD_KEEPALIVE"]:
+            # Idle clients are only heard from once per keepalive.
+            raise ValueError(
+                "LIVERELOAD_CLIENT_TIMEOUT must be greater than LIVERELOAD_KEEPALIVE."
+            )
+        # stop() closed the previous broadcaster for good.
+        self.waves = WaveBroadcaster(
+            config["LIVERELOAD_WAVE_SIZE"], config["LIVERELOAD_WAVE_TIMEOUT"]
+        )
+        watch_patterns = config["LIVERELOAD_WATCH_PATTERNS"]
+        ignore_patterns = config["LIVERELOAD_IGNORE_PATTERNS"]
+        roots = self.roots
+
+        logger.info(
+            "Watching %s (patterns %s, ignoring %s).",
+            roots,
+            watch_patterns,
+            ignore_patterns,
+            extra={"roots": roots},
+        )
+
+        self.router = Router(self.app.root_path, config["LIVERELOAD_RULES"])
+        use_gitignore = config["LIVERELOAD_USE_GITIGNORE"]
+        if use_gitignore:
+            self.ignore_tree = IgnoreTree.load(roots)
+
+        events: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.worker = ChangeWorker(
+            events,
+            self.broadcast,
+            watch_patterns,
+            ignore_patterns,
+            roots,
+            debounce=config["LIVERELOAD_DEBOUNCE"],
+            max_pending=config["LIVERELOAD_MAX_PENDING_EVENTS"],
+            ignore_tree=self.ignore_tree,
+            on_layout_change=self._replan if use_gitignore else None,
+            router=self.router,
+            settle=config["LIVERELOAD_BUILD_SETTLE"],
+        )
+        self.worker.start()
+        _running.add(self)
+
+        if not config["LIVERELOAD_WATCH"]:
+            logger.info("File watching disabled, waiting for notify() calls.")
+            return
+
+        self.watches = [
+            registry.watch(path, events, recursive) for path, recursive in self._plan()
+        ]
+
+        if config["LIVERELOAD_HEALTH_INTERVAL"]:
+            self.monitor = HealthMonitor(
+                lambda: self.roots if self.watches else (),
+                config["LIVERELOAD_HEALTH_INTERVAL"],
+                config["LIVERELOAD_HEALTH_TIMEOUT"],
+            )
+            self.monitor.start()
+
+    def _plan(self) -> List[Tuple[str, bool]]:
+        """The ``(directory, recursive)`` watches the application needs."""
+        if self.ignore_tree is None:
+            return [(root, True) for root in self.roots]
+        plan = []
+        for root in self.roots:
+            plan.extend(self.ignore_tree.watch_plan(root))
+        return plan
+
+    def _replan(self):
+        """
+        Reloads the ignore files and updates the watches after directories
+        were created or an ignore file changed.
+        """
+        if not self.watches:
+            return
+        self.ignore_tree = self.worker.ignore_tree = IgnoreTree.load(self.roots)
+        wanted = set(self._plan())
+        current = {watch.key: watch for watch in self.watches}
+        added = [
+            registry.watch(path, self.worker.events, recursive)
+            for path, recursive in wanted - set(current)
+        ]
+        for key in set(current) - wanted:
+            registry.unwatch(current.pop(key))
+        self.watches = list(current.values()) + added
+
+    def stop(self):
+        """
+        Releases the application's watches, ends every open ``/_livereload``
+        stream and stops the worker.
+
+        Threads are joined for at most ``LIVERELOAD_SHUTDOWN_TIMEOUT``
+        seconds in total; a thread still running after that is left behind
+        (it is a daemon) and logged.
+        """
+        _running.discard(self)
+        deadline = time.monotonic() + self.app.config["LIVERELOAD_SHUTDOWN_TIMEOUT"]
+        watches, self.watches = self.watches, []
+        monitor, self.monitor = self.monitor, None
+        if monitor is not None:
+            monitor.stop()
+        for watch in watches:
+            registry.unwatch(watch, timeout=max(0, deadline - time.monotonic()))
+        if monitor is not None:
+            monitor.join(timeout=max(0, deadline - time.monotonic()))
+        self.waves.close()
+        self.subscribers.close_all()
+        if self.running:
+            self.worker.stop()
+            self.worker.join(timeout=max(0, deadline - time.monotonic()))
+            if self.worker.is_alive():
+                logger.warning("Flask-LiveReload worker did not stop in time.")
+
+    def health(self, check: bool = False) -> dict:
+        """
+        The watcher status of the application: ``"ok"``, ``"degraded"``
+        (some roots fell back to polling), ``"failing"`` (a canary was
+        missed even while polling), ``"unknown"`` (not checked yet, or the
+        canary could not be written) or ``"stopped"``, plus the last check
+        of each root. With ``check``, the roots are checked first.
+        """
+        if not self.running:
+            return {"status": "stopped", "roots": {}}
+        roots = self.roots if self.watches else []
+        if check:
+            for root in roots:
+                registry.check(root, self.app.config["LIVERELOAD_HEALTH_TIMEOUT"])
+        results = {root: registry.health(root) for root in roots}
+        if any(h is not None and h.ok is False for h in results.values()):
+            status = "failing"
+        elif any(h is None or h.ok is None for h in results.values()):
+            status = "unknown"
+        elif any(h.polling for h in results.values()):
+            status = "degraded"
+        else:
+            status = "ok"
+        return {
+            "status": status,
+            "roots": {
+                root: None if h is None else h.to_dict() for root, h in results.items()
+            },
+        }
+
+    def notify(self, paths: Iterable[str], kind: str = MODIFIED):
+        """See :meth:`LiveReload.notify`."""
+        if kind not in _NOTIFY_EVENTS:
+            raise ValueError(f"Unsupported change kind: {kind!r}")
+        if not self.running:
+            raise RuntimeError("Flask-LiveReload is not running.")
+        if isinstance(paths, str):
+            paths = [paths]
+
+        event_class = _NOTIFY_EVENTS[kind]
+        self.worker.notify(
+            event_class(os.path.join(self.app.root_path, path)) for path in paths
+        )
+
+    def broadcast(self, changes: Iterable[Change]):
+        """
+        Queues each change for every subscriber whose page uses its paths.
+
+        Subscribers that stopped reading (see :meth:`Subscriber.is_behind`)
+        are evicted instead, which frees their buffer and ends their stream.
+        Changed templates are compiled first when prewarming is enabled, and
+        delivery is staggered in waves when ``LIVERELOAD_WAVE_SIZE`` is set.
+        Changes routed to ``"evict"`` only drop the template from the Jinja
+        cache and are not sent at all.
+        """
+        config = self.app.config
+        changes = list(changes)
+        if self.router is not None and self.router.has_rules:
+            evicted = [c for c in changes if self.router.action(c) == EVICT]
+            if evicted:
+                evict_templates(self.app, evicted)
+                changes = [c for c in changes if c not in evicted]
+                if not changes:
+                    return
+        if self.prewarmer is not None:
+            self.prewarmer.prewarm(changes)
+
+        def is_template(path: str) -> bool:
+            return template_name(self.app, path) is not None
+
+        batches: Dict[Subscriber, List[Change]] = {}
+        for change in changes:
+            for subscriber in self.subscribers.match(change.paths, is_template):
+                batches.setdefault(subscriber, []).append(change)
+        logger.debug(
+            "Notifying %d of %d subscribers.", len(batches), len(self.subscribers)
+        )
+        for subscriber, batch in list(batches.items()):
+            if subscriber.is_behind(
+                len(batch),
+                config["LIVERELOAD_SUBSCRIBER_BUFFER"],
+                config["LIVERELOAD_CLIENT_TIMEOUT"],
+            ):
+                logger.warning("Evicting a /_livereload client that fell behind.")
+                self.subscribers.evict(subscriber)
+                del batches[subscriber]
+
+        self.waves.deliver(batches, _send, self.subscribers.__contains__)
+
+
+def _send(subscriber: Subscriber, batch: List[Change]):
+    for change in batch:
+        subscriber.queue.put(change)
@@ -0,0 +1,260 @@
+"""
+Subscriber bookkeeping for the ``/_livereload`` endpoint.
+
+Every open SSE connection is a :class:`Subscriber` with its own message
+queue. Pages report the stylesheets, scripts and templates they use when they
+connect, and :class:`SubscriberIndex` keeps an inverted index from those file
+paths to the subscribers that need to hear about them.
+"""
+
+import os
+import time
+import collections
+import uuid
+import queue
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from flask import Flask
+from jinja2 import Environment, TemplateNotFound, meta
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import MapAdapter
+from werkzeug.security import safe_join
+
+from .events import Change
+
+logger = logging.getLogger(__name__)
+
+# Put on a subscriber's queue to end its stream.
+CLOSED = object()
+# Put before CLOSED when changes were dropped, so the page reloads anyway.
+STALE = object()
+
+# How many evicted subscribers are remembered for their reconnect.
+_EVICTED_MEMORY = 1024
+
+
+def normalize_path(path: str) -> str:
+    """Normalize a file path so watcher and index keys compare equal."""
+    return os.path.normcase(os.path.normpath(os.path.abspath(path)))
+
+
+class Subscriber:
+    """A single ``/_livereload`` connection and the files its page uses."""
+
+    def __init__(self, paths: Optional[Iterable[str]] = None):
+        self.queue: "queue.Queue[Change]" = queue.Queue()
+        self.paths = frozenset(normalize_path(p) for p in paths or ())
+        self.id = uuid.uuid4().hex
+        self.last_active = time.monotonic()
+
+    def touch(self):
+        """Records that the client has taken everything written so far."""
+        self.last_active = time.monotonic()
+
+    def is_behind(self, incoming: int, high_water: int, timeout: float) -> bool:
+        """
+        Whether the client can no longer keep up: ``incoming`` more changes
+        would push its buffer past ``high_water``, or it has had changes
+        waiting without reading anything for over ``timeout`` seconds.
+        """
+        pending = self.queue.qsize()
+        if pending + incoming > high_water:
+            return True
+        return pending > 0 and time.monotonic() - self.last_active > timeout
+
+    @property
+    def is_wildcard(self) -> bool:
+        """Whether this subscriber wants every change (it declared nothing)."""
+        return not self.paths
+
+    def close(self, stale: bool = False):
+        """
+        Drops anything still buffered and makes the stream end. With
+        ``stale``, the page is told to reload first since it missed changes.
+        """
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        if stale:
+            self.queue.put(STALE)
+        self.queue.put(CLOSED)
+
+
+class SubscriberIndex:
+    """
+    Inverted index from file paths to the subscribers whose page uses them.
+
+    Changes to a path that no subscriber declared (an ``@import``-ed
+    stylesheet, a module imported by another script, ...) cannot be routed and
+    are delivered to everyone. Templates are the exception: pages declare
+    every template they render, so an undeclared one only goes to wildcard
+    subscribers.
+    """
+
+    def __init__(self, max_subscribers: Optional[int] = None):
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._all: Set[Subscriber] = set()
+        self._wildcard: Set[Subscriber] = set()
+        self._by_path: Dict[str, Set[Subscriber]] = {}
+        self._evicted: "collections.deque[str]" = collections.deque(
+            maxlen=_EVICTED_MEMORY
+        )
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    def __contains__(self, subscriber: Subscriber) -> bool:
+        return subscriber in self._all
+
+    @property
+    def is_full(self) -> bool:
+        return (
+            self.max_subscribers is not None
+            and len(self._all) >= self.max_subscribers
+        )
+
+    def add(self, subscriber: Subscriber) -> bool:
+        """
+        Registers a subscriber under every path it declared. Returns False,
+        without registering it, when ``max_subscribers`` is reached.
+        """
+        with self._lock:
+            if self.is_full:
+                return False
+            self._all.add(subscriber)
+            if subscriber.is_wildcard:
+                self._wildcard.add(subscriber)
+            for path in subscriber.paths:
+                self._by_path.setdefault(path, set()).add(subscriber)
+        return True
+
+    def remove(self, subscriber: Subscriber):
+        """Drops a subscriber from the index; unknown subscribers are ignored."""
+        with self._lock:
+            self._all.discard(subscriber)
+            self._wildcard.discard(subscriber)
+            for path in subscriber.paths:
+                subscribers = self._by_path.get(path)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._by_path[path]
+
+    def evict(self, subscriber: Subscriber):
+        """
+        Drops a subscriber that fell behind and ends its stream with a
+        reload. Its id is remembered so that, should that last message not
+        get through either, the page is reloaded when it reconnects.
+        """
+        self.remove(subscriber)
+        with self._lock:
+            self._evicted.append(subscriber.id)
+        subscriber.close(stale=True)
+
+    def was_evicted(self, subscriber_id: str) -> bool:
+        """Whether ``subscriber_id`` was evicted; forgets it if so."""
+        with self._lock:
+            try:
+                self._evicted.remove(subscriber_id)
+            except ValueError:
+                return False
+        return True
+
+    def close_all(self):
+        """Ends every open stream and empties the index."""
+        with self._lock:
+            subscribers = self._all
+            self._all, self._wildcard, self._by_path = set(), set(), {}
+        for subscriber in subscribers:
+            subscriber.close()
+
+    def match(
+        self,
+        paths: Iterable[str],
+        is_template: Optional[Callable[[str], bool]] = None,
+    ) -> Set[Subscriber]:
+        """
+        Returns the subscribers that should be told about ``paths``.
+        ``is_template`` tells which undeclared paths are templates.
+        """
+        with self._lock:
+            targets = set(self._wildcard)
+            for path in paths:
+                subscribers = self._by_path.get(normalize_path(path))
+                if subscribers is not None:
+                    targets |= subscribers
+                elif is_template is None or not is_template(path):
+                    return set(self._all)
+            return targets
+
+
+def resolve_asset(app: Flask, adapter: MapAdapter, url_path: str) -> Optional[str]:
+    """Maps a static asset URL path to the file it is served from."""
+    try:
+        endpoint, values = adapter.match(url_path, method="GET")
+    except HTTPException:
+        return None
+
+    if endpoint == "static":
+        folder = app.static_folder
+    elif endpoint.endswith(".static"):
+        blueprint = app.blueprints.get(endpoint.rsplit(".", 1)[0])
+        folder = blueprint.static_folder if blueprint else None
+    else:
+        return None
+
+    if not folder or "filename" not in values:
+        return None
+    return safe_join(folder, values["filename"])
+
+
+def resolve_templates(env: Environment, names: Iterable[str]) -> Set[str]:
+    """
+    Maps template names to their source files, following ``extends``,
+    ``include`` and ``import`` so that a page also subscribes to its layouts
+    and partials.
+    """
+    files: Set[str] = set()
+    seen: Set[str] = set()
+    pending: List[str] = list(names)
+
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        try:
+            source, filename, _ = env.loader.get_source(env, name)
+        except TemplateNotFound:
+            continue
+        if filename:
+            files.add(filename)
+        try:
+            ast = env.parse(source)
+        except Exception as e:
+            logger.debug("Could not parse template %r: %s", name, e)
+            continue
+        pending.extend(
+            ref for ref in meta.find_referenced_templates(ast) if ref is not None
+        )
+    return files
+
+
+def resolve_subscription(
+    app: Flask, adapter: MapAdapter, assets: Iterable[str], templates: Iterable[str]
+) -> Set[str]:
+    """Resolves what a connecting page reported into watched file paths."""
+    paths = set()
+    for url_path in assets:
+        path = resolve_asset(app, adapter, url_path)
+        if path:
+            paths.add(path)
+    if app.jinja_env.loader is not None:
+        paths |= resolve_templates(app.jinja_env, templates)
+    return paths
@@ -0,0 +1,150 @@
+"""
+Template cache prewarming.
+
+When a template changes, every reloading tab requests a page that renders it
+at the same moment, and each of those requests would compile it again. With
+``LIVERELOAD_PREWARM_TEMPLATES`` on, :class:`TemplatePrewarmer` compiles the
+changed templates, and those that extend, include or import them, into the
+application's Jinja cache before the reload is broadcast.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Set
+
+from flask import Flask
+from jinja2 import FileSystemLoader, TemplateNotFound, meta
+
+from .events import Change, DELETED
+
+logger = logging.getLogger(__name__)
+
+
+def _search_paths(app: Flask) -> Iterator[str]:
+    """The folders the app and its blueprints load templates from."""
+    loaders = [app.jinja_loader]
+    loaders.extend(bp.jinja_loader for bp in app.iter_blueprints())
+    for loader in loaders:
+        if isinstance(loader, FileSystemLoader):
+            for path in loader.searchpath:
+                yield os.path.abspath(path)
+
+
+def template_name(app: Flask, path: str) -> Optional[str]:
+    """Maps a file path to the name the app would load it by, if any."""
+    path = os.path.abspath(path)
+    for folder in _search_paths(app):
+        if path.startswith(folder + os.sep):
+            return os.path.relpath(path, folder).replace(os.sep, "/")
+    return None
+
+
+def evict_templates(app: Flask, changes: Iterable[Change]) -> Set[str]:
+    """
+    Drops the templates touched by ``changes`` from the application's Jinja
+    cache so the next render loads them again. Returns their names.
+    """
+    names = {
+        template_name(app, path) for change in changes for path in change.paths
+    }
+    names.discard(None)
+    cache = app.jinja_env.cache
+    if names and cache is not None:
+        # Keys are (weakref to the loader, template name).
+        for key in list(cache.keys()):
+            if key[1] in names:
+                try:
+                    del cache[key]
+                except KeyError:
+                    pass
+    logger.debug("Evicted templates: %s", sorted(names))
+    return names
+
+
+class TemplatePrewarmer:
+    """Compiles changed templates and their dependents ahead of a reload."""
+
+    def __init__(self, app: Flask):
+        self.app = app
+        self._lock = threading.Lock()
+        # template name -> names of templates that reference it
+        self._dependents: Optional[Dict[str, Set[str]]] = None
+
+    def _references(self, name: str) -> Set[str]:
+        env = self.app.jinja_env
+        try:
+            source = env.loader.get_source(env, name)[0]
+            return {
+                ref
+                for ref in meta.find_referenced_templates(env.parse(source))
+                if ref is not None
+            }
+        except Exception:
+            return set()
+
+    def _build_graph(self) -> Dict[str, Set[str]]:
+        dependents: Dict[str, Set[str]] = {}
+        for name in self.app.jinja_env.list_templates():
+            for ref in self._references(name):
+                dependents.setdefault(ref, set()).add(name)
+        return dependents
+
+    def _update_graph(self, name: str, deleted: bool):
+        for names in self._dependents.values():
+            names.discard(name)
+        if not deleted:
+            for ref in self._references(name):
+                self._dependents.setdefault(ref, set()).add(name)
+
+    def affected(self, names: Iterable[str]) -> Set[str]:
+        """The given templates plus everything that transitively uses them."""
+        result: Set[str] = set()
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name not in result:
+                result.add(name)
+                pending.extend(self._dependents.get(name, ()))
+        return result
+
+    def prewarm(self, changes: Iterable[Change]) -> Set[str]:
+        """
+        Compiles the templates touched by ``changes`` and their dependents.
+        Returns the names of the templates that were compiled.
+        """
+        changed: Dict[str, bool] = {}
+        for change in changes:
+            for path in change.paths:
+                name = template_name(self.app, path)
+                if name is not None:
+                    changed[name] = change.kind == DELETED or (
+                        path == change.path and change.dest_path is not None
+                    )
+        if not changed:
+            return set()
+
+        env = self.app.jinja_env
+        compiled = set()
+        with self._lock:
+            if self._dependents is None:
+                self._dependents = self._build_graph()
+            for name, deleted in changed.items():
+                self._update_graph(name, deleted)
+            for name in self.affected(
+                name for name, deleted in changed.items() if not deleted
+            ):
+                try:
+                    env.get_template(name)
+                except TemplateNotFound:
+                    continue
+                except Exception as e:
+                    # Half-written templates are common mid-edit; the page
+                    # will show the error once it reloads.
+                    logger.debug("Could not prewarm template %r: %s", name, e)
+                    continue
+                compiled.add(name)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prewarmed templates: %s", sorted(compiled))
+        return compiled
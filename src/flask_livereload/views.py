@@ -1,37 +1,193 @@
 import logging
 import queue
+import ipaddress
+import random
 import time
+from typing import Optional
 
-from flask import Blueprint, Response, current_app
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+
+from .events import encode_batch
+from .rules import RELOAD
+from .subscribers import CLOSED, STALE, Subscriber, resolve_subscription
+from .templates import template_name
 
 logger = logging.getLogger(__name__)
 livereload_bp = Blueprint("livereload", __name__)
 
 
+def _is_loopback(addr: Optional[str]) -> bool:
+    """Whether a client address is local, including IPv4-mapped IPv6 forms."""
+    try:
+        ip = ipaddress.ip_address((addr or "").split("%", 1)[0])
+    except ValueError:
+        return False
+    if getattr(ip, "ipv4_mapped", None) is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_loopback
+
+
 @livereload_bp.route("/_livereload")
 def sse():
     """Server-Sent Events endpoint to notify the client of changes."""
-    change_queue = current_app.extensions["livereload"].change_queue
+    state = current_app.extensions["livereload"]
+    if not state.running:
+        abort(503)
+    subscribers = state.subscribers
+    if subscribers.is_full:
+        abort(503, description="Too many LiveReload connections.")
+    keepalive = current_app.config["LIVERELOAD_KEEPALIVE"]
+    jitter = current_app.config["LIVERELOAD_RELOAD_JITTER"]
+    staggered = bool(current_app.config["LIVERELOAD_WAVE_SIZE"])
+    morph = current_app.config["LIVERELOAD_MORPH"]
+    app = current_app._get_current_object()
+    router = state.router
+    paths = resolve_subscription(
+        current_app,
+        current_app.url_map.bind_to_environ(request.environ),
+        request.args.getlist("asset"),
+        request.args.getlist("template"),
+    )
+    subscriber = Subscriber(paths)
+    # Event ids carry the subscriber id, which EventSource sends back as
+    # Last-Event-ID when it reconnects.
+    previous_id = request.headers.get("Last-Event-ID", "").split("-", 1)[0]
+    missed = bool(previous_id) and subscribers.was_evicted(previous_id)
 
     def gen():
+        if not subscribers.add(subscriber):
+            # Lost a race for the last slot; tell the client to back off.
+            yield "retry: 30000\n\n"
+            return
+        seq = 0
         try:
-            yield "data: connected\n\n"
+            yield f"id: {subscriber.id}-0\ndata: connected\n\n"
+            if missed:
+                # The previous connection was evicted with changes pending.
+                seq += 1
+                yield encode_batch(
+                    seq, [], event_id=f"{subscriber.id}-{seq}", stale=True
+                )
             while True:
                 try:
-                    message = change_queue.get(timeout=30)
-                    time.sleep(0.2)
-                    logger.debug(f"Sending SSE message: {message}")
-                    yield f"data: {message}\n\n"
+                    change = subscriber.queue.get(timeout=keepalive)
                 except queue.Empty:
                     yield ": keepalive\n\n"
+                    continue
+                finally:
+                    # Waiting for changes is not falling behind.
+                    subscriber.touch()
+                if change is CLOSED:
+                    logger.debug("SSE connection closed by server.")
+                    return
+                if change is STALE:
+                    logger.debug("SSE client evicted, asking it to reload.")
+                    seq += 1
+                    yield encode_batch(
+                        seq, [], event_id=f"{subscriber.id}-{seq}", stale=True
+                    )
+                    return
+                # Give bursts (editor saves, checkouts) a moment to land and
+                # flush everything queued so far as one event.
+                time.sleep(0.2)
+                changes = [change]
+                closed = stale = False
+                while True:
+                    try:
+                        change = subscriber.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if change is CLOSED or change is STALE:
+                        # Evicted mid-burst: what was taken so far still goes
+                        # out, as a reload.
+                        closed = True
+                        stale = change is STALE
+                        break
+                    changes.append(change)
+                seq += 1
+                extra = {}
+                if jitter:
+                    extra["delay"] = random.randint(0, jitter)
+                if staggered:
+                    extra["client"] = subscriber.id
+                if stale:
+                    extra["stale"] = True
+                reloads = not router.has_rules or any(
+                    router.action(change) == RELOAD for change in changes
+                )
+                if morph and reloads and _only_templates(app, changes):
+                    extra["morph"] = True
+                actions = router.action if router.has_rules else None
+                message = encode_batch(
+                    seq, changes, actions, f"{subscriber.id}-{seq}", **extra
+                )
+                logger.debug("Sending SSE message: %s", message)
+                yield message
+                if closed:
+                    logger.debug("SSE connection closed by server.")
+                    return
         except GeneratorExit:
 
-            logger.info("SSE connection closed by client.")
+            logger.debug("SSE connection closed by client.")
         except Exception as e:
-            logger.error(f"Error in SSE stream: {e}")
-            yield f"data: error\n\n"
+            logger.error("Error in SSE stream: %s", e)
+            yield "data: error\n\n"
+        finally:
+            subscribers.remove(subscriber)
 
     response = Response(gen(), mimetype="text/event-stream")
     response.headers["Cache-Control"] = "no-cache"
     response.headers["Connection"] = "keep-alive"
     return response
+
+
+def _only_templates(app, changes) -> bool:
+    """
+    Whether a batch only touches templates, so re-rendering the page is
+    enough and its assets need not be fetched again.
+    """
+    return all(
+        template_name(app, path) is not None
+        for change in changes
+        for path in change.paths
+    )
+
+
+@livereload_bp.route("/_livereload/notify", methods=["POST"])
+def notify():
+    """Lets local build tools report changed files (see ``LiveReload.notify``)."""
+    if not _is_loopback(request.remote_addr):
+        abort(403)
+
+    data = request.get_json(silent=True) or {}
+    paths = data.get("paths")
+    kind = data.get("kind", "modified")
+    if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
+        abort(400, description="'paths' must be a list of strings.")
+
+    try:
+        current_app.extensions["livereload"].notify(paths, kind)
+    except ValueError as e:
+        abort(400, description=str(e))
+    except RuntimeError as e:
+        abort(503, description=str(e))
+    return jsonify(queued=len(paths)), 202
+
+
+@livereload_bp.route("/_livereload/ack", methods=["POST"])
+def ack():
+    """Lets a page report that its staggered reload has finished."""
+    data = request.get_json(silent=True) or {}
+    client_id = data.get("client")
+    if not isinstance(client_id, str):
+        abort(400, description="'client' must be a string.")
+    current_app.extensions["livereload"].waves.ack(client_id)
+    return "", 204
+
+
+@livereload_bp.route("/_livereload/health")
+def health():
+    """Reports the watcher status (see ``LiveReload.health``)."""
+    report = current_app.extensions["livereload"].health()
+    code = 503 if report["status"] in ("stopped", "failing") else 200
+    return jsonify(report), code
@@ -0,0 +1,118 @@
+"""
+Staggered delivery of reloads.
+
+With many tabs open, sending the reload to all of them at once makes every
+tab hit a (usually single-threaded) development server in the same instant.
+:class:`WaveBroadcaster` instead keeps at most ``wave_size`` subscribers
+reloading at a time: a subscriber counts until the reloaded page reports back
+(see the ``/_livereload/ack`` endpoint) or ``timeout`` seconds pass, and the
+next waiting subscriber is sent its changes as soon as a slot frees up.
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .events import Change
+from .subscribers import Subscriber
+
+logger = logging.getLogger(__name__)
+
+
+class WaveBroadcaster:
+    """Delivers batches to a bounded number of subscribers at a time."""
+
+    def __init__(self, wave_size: Optional[int], timeout: float):
+        self.wave_size = wave_size
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        # Changes not sent yet, merged per subscriber in arrival order.
+        self._pending: Dict[Subscriber, List[Change]] = {}
+        # client id -> (subscriber, ack deadline)
+        self._in_flight: Dict[str, Tuple[Subscriber, float]] = {}
+        self._send: Optional[Callable[[Subscriber, List[Change]], None]] = None
+        self._is_connected: Callable[[Subscriber], bool] = lambda subscriber: True
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def ack(self, client_id: str) -> bool:
+        """Records that a client finished reloading. Returns False if unknown."""
+        with self._cond:
+            if self._in_flight.pop(client_id, None) is None:
+                return False
+            self._pump()
+            self._cond.notify()
+        return True
+
+    def close(self):
+        """Drops undelivered batches and stops the delivery thread."""
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._in_flight.clear()
+            self._cond.notify()
+
+    def deliver(
+        self,
+        batches: Dict[Subscriber, List[Change]],
+        send: Callable[[Subscriber, List[Change]], None],
+        is_connected: Callable[[Subscriber], bool],
+    ):
+        """
+        Calls ``send`` for every subscriber's batch. Without a ``wave_size``
+        everything is sent right away; otherwise batches beyond the free
+        slots wait, merged with any later ones for the same subscriber, and
+        go out from a single background thread as slots free up.
+        """
+        if not self.wave_size:
+            for subscriber, batch in batches.items():
+                send(subscriber, batch)
+            return
+
+        with self._cond:
+            if self._closed:
+                return
+            self._send = send
+            self._is_connected = is_connected
+            for subscriber, batch in batches.items():
+                self._pending.setdefault(subscriber, []).extend(batch)
+            self._pump()
+            if self._pending and self._thread is None:
+                logger.debug(
+                    "%d client(s) waiting for a reload slot.", len(self._pending)
+                )
+                self._thread = threading.Thread(
+                    target=self._run, name="flask-livereload-waves", daemon=True
+                )
+                self._thread.start()
+
+    def _pump(self):
+        """Sends pending batches while slots are free. Holds the lock."""
+        now = time.monotonic()
+        # A reloading tab disconnects; its slot stays taken until the new
+        # page acknowledges with the old id, or the deadline passes.
+        for client_id, (subscriber, deadline) in list(self._in_flight.items()):
+            if deadline <= now:
+                del self._in_flight[client_id]
+        for subscriber in list(self._pending):
+            if len(self._in_flight) >= self.wave_size:
+                return
+            if subscriber.id in self._in_flight:
+                # Still reloading from its last batch; this one waits.
+                continue
+            batch = self._pending.pop(subscriber)
+            if not self._is_connected(subscriber):
+                continue
+            self._in_flight[subscriber.id] = (subscriber, now + self.timeout)
+            self._send(subscriber, batch)
+
+    def _run(self):
+        with self._cond:
+            while self._pending and not self._closed:
+                deadlines = [deadline for _, deadline in self._in_flight.values()]
+                wait = min(deadlines) - time.monotonic() if deadlines else None
+                if wait is None or wait > 0:
+                    self._cond.wait(wait)
+                self._pump()
+            self._thread = None
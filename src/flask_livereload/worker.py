@@ -0,0 +1,326 @@
+"""
+Background processing of raw file system events.
+
+The watchdog handler only enqueues raw events; everything else (atomic-save
+normalization, pattern matching, content hashing and fan-out) happens here on
+a dedicated thread so the observer never falls behind the kernel.
+"""
+
+import os
+import time
+import queue
+import hashlib
+import fnmatch
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from watchdog.events import FileSystemEvent
+from watchdog.utils.dirsnapshot import DirectorySnapshot, DirectorySnapshotDiff
+
+from .events import Change, CREATED, DELETED, MODIFIED, MOVED, normalize
+from .ignore import IGNORE_FILES, IgnoreTree
+from .rules import Router
+
+logger = logging.getLogger(__name__)
+
+_EVENT_KINDS = {
+    "modified": MODIFIED,
+    "created": CREATED,
+    "moved": MOVED,
+    "deleted": DELETED,
+}
+
+# Put on the event queue to make the worker exit.
+_STOP = object()
+
+
+def _digest(path: str) -> Optional[str]:
+    """Hashes a file's content, or returns None if it cannot be read."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except OSError:
+        return None
+
+
+class ChangeWorker(threading.Thread):
+    """
+    Turns batches of raw watchdog events into changes for ``on_change``.
+
+    The worker waits ``debounce`` seconds after the first event of a burst,
+    drains everything queued meanwhile and processes it as one batch. A
+    backlog larger than ``max_pending`` events is treated as an overflow:
+    individual events are discarded and the watched roots are rescanned
+    instead.
+
+    With an ``ignore_tree``, gitignored files are filtered out too (except
+    for paths passed to :meth:`notify`), and ``on_layout_change`` is called
+    when a batch creates directories or touches an ignore file, so the
+    caller can update its watches.
+
+    With a ``router``, files routed to ``"ignore"`` are filtered out, and a
+    batch touching files routed to ``"build"`` is held until no event has
+    arrived for ``settle`` seconds.
+    """
+
+    def __init__(
+        self,
+        events: "queue.SimpleQueue",
+        on_change: Callable[[List[Change]], None],
+        watch_patterns: List[str],
+        ignore_patterns: List[str],
+        roots: Iterable[str] = (),
+        debounce: float = 0.1,
+        max_pending: int = 10000,
+        ignore_tree: Optional[IgnoreTree] = None,
+        on_layout_change: Optional[Callable[[], None]] = None,
+        router: Optional[Router] = None,
+        settle: float = 1.0,
+    ):
+        super().__init__(name="flask-livereload-worker", daemon=True)
+        self.events = events
+        self.on_change = on_change
+        self.watch_patterns = watch_patterns
+        self.ignore_patterns = ignore_patterns
+        self.roots = list(roots)
+        self.debounce = debounce
+        self.max_pending = max_pending
+        self.ignore_tree = ignore_tree
+        self.on_layout_change = on_layout_change
+        self.router = router
+        self.settle = settle
+        self._digests: Dict[str, Optional[str]] = {}
+        self._snapshots: Dict[str, Optional[DirectorySnapshot]] = {}
+        # Paths reported through notify() that were not processed yet.
+        self._notified: Set[str] = set()
+
+    def notify(self, events: Iterable[FileSystemEvent]):
+        """
+        Queues events reported by a build tool. Their paths are not checked
+        against the ``ignore_tree``: build output is usually gitignored.
+        """
+        for event in events:
+            self._notified.add(event.src_path)
+            self.events.put(event)
+
+    def is_watched(self, path: str, notified: bool = False) -> bool:
+        """Check if a file path matches the watch/ignore patterns."""
+        if (
+            not notified
+            and self.ignore_tree is not None
+            and self.ignore_tree.is_ignored(path)
+        ):
+            return False
+
+        if self.router is not None and self.router.ignores(path):
+            return False
+
+        for pattern in self.ignore_patterns:
+            if fnmatch.fnmatch(path, pattern):
+                return False
+
+        if not self.watch_patterns:
+            return True
+
+        for pattern in self.watch_patterns:
+            if fnmatch.fnmatch(path, pattern):
+                return True
+        return False
+
+    def run(self):
+        # Baseline for rescans after an overflow.
+        for root in self.roots:
+            if root not in self._snapshots:
+                self._snapshots[root] = self._snapshot(root)
+        while True:
+            event = self.events.get()
+            if event is _STOP:
+                return
+            received = time.monotonic()
+            # Let the rest of the burst (editor save, checkout) land.
+            time.sleep(self.debounce)
+            batch = [event]
+            self._drain(batch)
+            # Build output is only reported once the build went quiet.
+            while (
+                _STOP not in batch
+                and len(batch) <= self.max_pending
+                and self._is_building(batch)
+            ):
+                time.sleep(self.settle)
+                if not self._drain(batch):
+                    break
+
+            stopping = _STOP in batch
+            if stopping:
+                batch = [e for e in batch if e is not _STOP]
+            if len(batch) > self.max_pending:
+                logger.warning(
+                    "%d pending file events, rescanning watched paths.",
+                    len(batch),
+                    extra={"events": len(batch)},
+                )
+                self.rescan(received)
+            elif batch:
+                self.process(batch, received)
+            if stopping:
+                return
+
+    def _drain(self, batch: List[FileSystemEvent]) -> bool:
+        """Appends everything queued to ``batch``; returns whether it grew."""
+        size = len(batch)
+        while True:
+            try:
+                batch.append(self.events.get_nowait())
+            except queue.Empty:
+                return len(batch) > size
+
+    def _is_building(self, batch: List[FileSystemEvent]) -> bool:
+        if self.router is None:
+            return False
+        return any(
+            self.router.holds(path)
+            for event in batch
+            for path in (event.src_path, getattr(event, "dest_path", None))
+            if path
+        )
+
+    def stop(self):
+        """Asks the worker to exit once it has processed what is queued."""
+        self.events.put(_STOP)
+
+    def process(
+        self, events: Iterable[FileSystemEvent], received: Optional[float] = None
+    ):
+        """
+        Normalizes, filters and reports one batch of raw events. ``received``
+        is the monotonic time the first of them arrived, used to log latency.
+        """
+        events = list(events)
+        if self.on_layout_change is not None and any(
+            map(self._changes_layout, events)
+        ):
+            self.on_layout_change()
+        raw = [
+            Change(
+                _EVENT_KINDS[event.event_type],
+                event.src_path,
+                getattr(event, "dest_path", None) or None,
+            )
+            for event in events
+            if not event.is_directory and event.event_type in _EVENT_KINDS
+        ]
+        self._report(normalize(raw), received)
+
+    def _changes_layout(self, event: FileSystemEvent) -> bool:
+        if event.is_directory:
+            return event.event_type in ("created", "moved")
+        return os.path.basename(event.src_path) in IGNORE_FILES or (
+            os.path.basename(getattr(event, "dest_path", "") or "") in IGNORE_FILES
+        )
+
+    def rescan(self, received: Optional[float] = None):
+        """Diffs the watched roots against their last snapshot."""
+        raw: List[Change] = []
+        for root in self.roots:
+            snapshot = self._snapshot(root)
+            previous = self._snapshots.get(root)
+            self._snapshots[root] = snapshot
+            if previous is None or snapshot is None:
+                continue
+            diff = DirectorySnapshotDiff(previous, snapshot)
+            raw.extend(Change(CREATED, path) for path in diff.files_created)
+            raw.extend(Change(DELETED, path) for path in diff.files_deleted)
+            raw.extend(Change(MODIFIED, path) for path in diff.files_modified)
+            raw.extend(Change(MOVED, src, dest) for src, dest in diff.files_moved)
+        self._report(normalize(raw), received)
+
+    def _listdir(self, path: str) -> List[os.DirEntry]:
+        with os.scandir(path) as entries:
+            return [
+                entry
+                for entry in entries
+                if not self.ignore_tree.is_ignored(entry.path, entry.is_dir())
+            ]
+
+    def _snapshot(self, root: str) -> Optional[DirectorySnapshot]:
+        listdir = os.scandir if self.ignore_tree is None else self._listdir
+        try:
+            return DirectorySnapshot(root, recursive=True, listdir=listdir)
+        except OSError as e:
+            logger.warning("Could not scan %s: %s", root, e, extra={"path": root})
+            return None
+
+    def _report(self, changes: List[Change], received: Optional[float] = None):
+        """
+        Hands the watched, actually modified changes to ``on_change``.
+
+        Each decision is logged at DEBUG with ``path``, ``event_type`` and
+        ``decision`` fields; the batch as a whole gets one INFO line with its
+        counts and latency.
+        """
+        debug = logger.isEnabledFor(logging.DEBUG)
+        matched = []
+        for change in changes:
+            notified = not self._notified.isdisjoint(change.paths)
+            if notified:
+                self._notified.difference_update(change.paths)
+            if not any(self.is_watched(p, notified) for p in change.paths):
+                decision = "ignored"
+            elif self._is_unchanged(change):
+                decision = "unchanged"
+            else:
+                decision = "matched"
+                matched.append(change)
+            if debug:
+                path = change.dest_path or change.path
+                logger.debug(
+                    "File change %s: %s on %s",
+                    decision,
+                    change.kind,
+                    path,
+                    extra={
+                        "path": path,
+                        "event_type": change.kind,
+                        "decision": decision,
+                    },
+                )
+        if not matched:
+            return
+        self.on_change(matched)
+        if logger.isEnabledFor(logging.INFO):
+            latency = 0.0
+            if received is not None:
+                latency = (time.monotonic() - received) * 1000
+            logger.info(
+                "Reloading for %d of %d file change(s) (first: %s) after %.0f ms.",
+                len(matched),
+                len(changes),
+                matched[0].dest_path or matched[0].path,
+                latency,
+                extra={
+                    "changes": len(changes),
+                    "matched": len(matched),
+                    "path": matched[0].dest_path or matched[0].path,
+                    "latency_ms": latency,
+                },
+            )
+
+    def _is_unchanged(self, change: Change) -> bool:
+        """
+        Whether a modification left the file's content as it was, as happens
+        when an editor saves an unmodified buffer or a build rewrites
+        identical output.
+        """
+        path = change.dest_path or change.path
+        if change.kind in (DELETED, MOVED):
+            self._digests.pop(change.path, None)
+        if change.kind == DELETED:
+            return False
+        digest = _digest(path)
+        previous = self._digests.get(path)
+        self._digests[path] = digest
+        return (
+            change.kind == MODIFIED and digest is not None and digest == previous
+        )
@@ -0,0 +1,65 @@
+"""
+Utilidades compartidas por las pruebas
+"""
+
+import json
+import time
+import pytest
+from flask import Flask
+
+
+@pytest.fixture
+def make_app():
+    """
+    Build a debug test app rooted at ``root_path`` with the given config.
+    Passing a ``LiveReload`` instance initializes it with the app; it is
+    closed when the test ends.
+    """
+    instances = []
+
+    def make_app(root_path=None, livereload=None, **config):
+        kwargs = {} if root_path is None else {"root_path": str(root_path)}
+        app = Flask(__name__, **kwargs)
+        app.config['TESTING'] = True
+        app.config.update(config)
+        app.debug = True
+        if livereload is not None:
+            livereload.init_app(app)
+            instances.append(livereload)
+        return app
+
+    yield make_app
+    for livereload in instances:
+        livereload.close()
+
+
+@pytest.fixture
+def wait_until():
+    """Poll ``condition`` until it holds or ``timeout`` seconds pass."""
+
+    def wait_until(condition, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    return wait_until
+
+
+@pytest.fixture
+def read_batch():
+    """
+    Open ``/_livereload``, broadcast ``changes`` and return the decoded
+    payload of the reload event the page receives.
+    """
+
+    def read_batch(app, changes):
+        state = app.extensions["livereload"]
+        with app.test_client().get('/_livereload') as response:
+            stream = iter(response.response)
+            next(stream)
+            state.broadcast(changes)
+            message = next(stream).decode()
+        return json.loads(message.split("data: ", 1)[1])
+
+    return read_batch
@@ -0,0 +1,193 @@
+"""
+Pruebas para el formato de eventos y el manejador de cambios
+"""
+
+import json
+import time
+import queue
+import logging
+import pytest
+from watchdog.events import (
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
+)
+from flask_livereload.events import Change, encode_batch, normalize
+from flask_livereload.worker import ChangeWorker
+
+T = "/srv/templates/"
+
+# Event sequences recorded from common editors saving templates/index.html.
+EDITOR_TRACES = {
+    "vim": [
+        FileCreatedEvent(T + "4913"),
+        FileModifiedEvent(T + "4913"),
+        FileDeletedEvent(T + "4913"),
+        FileMovedEvent(T + "index.html", T + "index.html~"),
+        FileCreatedEvent(T + "index.html"),
+        FileModifiedEvent(T + "index.html"),
+        FileModifiedEvent(T + ".index.html.swp"),
+        FileDeletedEvent(T + "index.html~"),
+    ],
+    "jetbrains": [
+        FileCreatedEvent(T + "index.html___jb_tmp___"),
+        FileModifiedEvent(T + "index.html___jb_tmp___"),
+        FileMovedEvent(T + "index.html", T + "index.html___jb_old___"),
+        FileMovedEvent(T + "index.html___jb_tmp___", T + "index.html"),
+        FileDeletedEvent(T + "index.html___jb_old___"),
+    ],
+    "emacs": [
+        FileCreatedEvent(T + ".#index.html"),
+        FileMovedEvent(T + "index.html", T + "index.html~"),
+        FileCreatedEvent(T + "index.html"),
+        FileModifiedEvent(T + "index.html"),
+        FileDeletedEvent(T + ".#index.html"),
+    ],
+    "gedit": [
+        FileCreatedEvent(T + ".goutputstream-X1Y2Z3"),
+        FileModifiedEvent(T + ".goutputstream-X1Y2Z3"),
+        FileMovedEvent(T + ".goutputstream-X1Y2Z3", T + "index.html"),
+    ],
+    "vscode": [
+        FileModifiedEvent(T + "index.html"),
+        FileModifiedEvent(T + "index.html"),
+    ],
+}
+
+
+def make_worker(changes, **kwargs):
+    return ChangeWorker(
+        queue.SimpleQueue(), changes.extend, ["*.html", "*.css"], ["*/.git/*"], **kwargs
+    )
+
+
+def test_encode_batch_is_single_compact_event():
+    """Test that a batch becomes one SSE event with deduplicated changes."""
+    message = encode_batch(3, [
+        Change("modified", "/srv/a.css"),
+        Change("modified", "/srv/a.css"),
+        Change("moved", "/srv/a.tmp", "/srv/b.html"),
+    ])
+
+    lines = message.split("\n")
+    assert lines[:2] == ["id: 3", "event: reload"]
+    assert message.endswith("\n\n") and message.count("data:") == 1
+    assert " " not in lines[2][len("data: "):]
+    assert json.loads(lines[2][len("data: "):]) == {
+        "seq": 3,
+        "changes": [
+            {"type": "modified", "path": "/srv/a.css"},
+            {"type": "moved", "path": "/srv/a.tmp", "dest_path": "/srv/b.html"},
+        ],
+    }
+
+
+def test_move_onto_watched_file_is_reported():
+    """Test that atomic-rename saves are matched on the destination path."""
+    changes = []
+    make_worker(changes).process([
+        FileMovedEvent(T + "about.html", T + "index.html"),
+        FileModifiedEvent(T + "notes.txt"),
+    ])
+
+    assert changes == [Change("moved", T + "about.html", T + "index.html")]
+
+
+@pytest.mark.parametrize("editor", sorted(EDITOR_TRACES))
+def test_editor_save_is_one_modification(editor):
+    """Test that each editor's save sequence folds into a single change."""
+    changes = []
+    make_worker(changes).process(EDITOR_TRACES[editor])
+
+    assert changes == [Change("modified", T + "index.html")]
+
+
+def test_deletions_are_reported():
+    """Test that deleting a watched file triggers a change."""
+    changes = []
+    make_worker(changes).process([FileDeletedEvent(T + "index.html")])
+
+    assert changes == [Change("deleted", T + "index.html")]
+
+
+def test_transient_files_are_dropped():
+    """Test that a file created and deleted within a burst is ignored."""
+    assert normalize([
+        Change("created", T + "draft.html"),
+        Change("modified", T + "draft.html"),
+        Change("deleted", T + "draft.html"),
+    ]) == []
+
+
+def test_worker_batches_raw_events(tmp_path):
+    """Test that the worker drains a burst and reports it as one batch."""
+    batches = []
+    worker = ChangeWorker(
+        queue.SimpleQueue(), batches.append, ["*.css"], [], debounce=0.05
+    )
+    worker.start()
+    for name in ("a.css", "b.css"):
+        (tmp_path / name).write_text("body {}")
+        worker.events.put(FileModifiedEvent(str(tmp_path / name)))
+    worker.stop()
+    worker.join(timeout=1)
+
+    assert batches == [[
+        Change("modified", str(tmp_path / "a.css")),
+        Change("modified", str(tmp_path / "b.css")),
+    ]]
+
+
+def test_batch_is_logged_once(tmp_path, caplog):
+    """Test that a batch yields one INFO summary and per-file DEBUG fields."""
+    worker = ChangeWorker(queue.SimpleQueue(), lambda changes: None, ["*.css"], [])
+    for name in ("a.css", "b.css"):
+        (tmp_path / name).write_text(name)
+
+    with caplog.at_level(logging.DEBUG, logger="flask_livereload.worker"):
+        worker.process([
+            FileModifiedEvent(str(tmp_path / "a.css")),
+            FileModifiedEvent(str(tmp_path / "b.css")),
+            FileModifiedEvent(str(tmp_path / "app.py")),
+        ], time.monotonic())
+
+    summaries = [r for r in caplog.records if r.levelno == logging.INFO]
+    assert len(summaries) == 1
+    assert summaries[0].matched == 2
+    assert summaries[0].changes == 3
+    assert summaries[0].latency_ms >= 0
+    decisions = {
+        r.path: r.decision for r in caplog.records if r.levelno == logging.DEBUG
+    }
+    assert decisions[str(tmp_path / "app.py")] == "ignored"
+    assert decisions[str(tmp_path / "a.css")] == "matched"
+
+
+def test_unchanged_content_is_skipped(tmp_path):
+    """Test that rewriting a file with identical content does not reload."""
+    css = tmp_path / "app.css"
+    css.write_text("body {}")
+    changes = []
+    worker = make_worker(changes)
+
+    worker.process([FileModifiedEvent(str(css))])
+    worker.process([FileModifiedEvent(str(css))])
+    css.write_text("body { color: red }")
+    worker.process([FileModifiedEvent(str(css))])
+
+    assert len(changes) == 2
+
+
+def test_backlog_overflow_rescans(tmp_path):
+    """Test that a backlog past the limit is replaced by a rescan."""
+    changes = []
+    worker = make_worker(changes, roots=[str(tmp_path)], max_pending=2)
+    worker._snapshots = {str(tmp_path): worker._snapshot(str(tmp_path))}
+    (tmp_path / "new.html").write_text("<p>new</p>")
+    for _ in range(5):
+        worker.events.put(FileModifiedEvent(str(tmp_path / "other.txt")))
+    worker.stop()
+    worker.run()
+
+    assert changes == [Change("created", str(tmp_path / "new.html"))]
@@ -0,0 +1,86 @@
+"""
+Pruebas para la autocomprobación del observador
+"""
+
+import pytest
+from flask_livereload import LiveReload
+from flask_livereload.observer import registry
+
+
+@pytest.fixture
+def templates(tmp_path):
+    (tmp_path / "templates").mkdir()
+    return tmp_path / "templates"
+
+
+def test_canary_arrives(templates, make_app):
+    """Test that a working watcher reports ok with a latency."""
+    app = make_app(templates.parent)
+    with LiveReload(app) as livereload:
+        assert livereload.health()["status"] == "unknown"
+
+        report = livereload.health(check=True)
+        assert report["status"] == "ok"
+        root = report["roots"][str(templates)]
+        assert root["ok"] and root["observer"] == "native"
+        assert root["latency_ms"] >= 0
+        assert not list(templates.iterdir())
+
+
+def test_silent_watch_falls_back_to_polling(templates, make_app):
+    """Test that a root whose events stop arriving is switched to polling."""
+    app = make_app(templates.parent, LIVERELOAD_HEALTH_TIMEOUT=0.2)
+    with LiveReload(app) as livereload:
+        # Simulate inotify silently dropping the watch.
+        key = (str(templates), True)
+        watch = registry._scheduled[key][1]
+        registry.observer._emitter_for_watch[watch].stop()
+
+        report = livereload.health(check=True)
+        assert report["status"] == "degraded"
+        assert registry.polled == {str(templates)}
+        assert registry.polling_observer is not None
+        root = report["roots"][str(templates)]
+        assert root["ok"] and root["observer"] == "polling"
+
+        response = app.test_client().get('/_livereload/health')
+        assert response.status_code == 200
+
+    assert registry.polling_observer is None
+    assert registry.observer is None
+
+
+def test_unwritable_root_is_not_a_missed_event(templates, make_app, monkeypatch):
+    """Test that a canary write failure leaves the native watch in place."""
+    app = make_app(templates.parent)
+    with LiveReload(app) as livereload:
+        def refuse(*args, **kwargs):
+            raise PermissionError("read-only")
+
+        monkeypatch.setattr(
+            "flask_livereload.observer.open", refuse, raising=False
+        )
+        report = livereload.health(check=True)
+        monkeypatch.undo()
+
+        root = report["roots"][str(templates)]
+        assert report["status"] == "unknown"
+        assert root["ok"] is None and "read-only" in root["error"]
+        assert root["observer"] == "native"
+        assert registry.polled == set()
+        assert registry.polling_observer is None
+
+
+def test_monitor_checks_periodically(templates, make_app, wait_until):
+    """Test that LIVERELOAD_HEALTH_INTERVAL runs the canary in the background."""
+    app = make_app(templates.parent, LIVERELOAD_HEALTH_INTERVAL=0.05)
+    with LiveReload(app):
+        monitor = app.extensions["livereload"].monitor
+        assert wait_until(lambda: registry.health(str(templates)) is not None)
+
+        response = app.test_client().get('/_livereload/health')
+        assert response.status_code == 200
+        assert response.get_json()["status"] == "ok"
+
+    assert not monitor.is_alive()
+    assert app.test_client().get('/_livereload/health').status_code == 503
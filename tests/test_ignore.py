@@ -0,0 +1,113 @@
+"""
+Pruebas para el filtrado basado en .gitignore
+"""
+
+import pytest
+from watchdog.events import DirCreatedEvent, FileModifiedEvent
+from flask_livereload import LiveReload
+from flask_livereload.ignore import IgnoreTree, parse_rules
+from flask_livereload.observer import registry
+from flask_livereload.subscribers import Subscriber
+
+
+def tree_for(root, rules):
+    return IgnoreTree({str(root): parse_rules(rules)})
+
+
+def test_gitignore_semantics(tmp_path):
+    """Test that negation, directory-only and anchored rules behave like git."""
+    tree = tree_for(tmp_path, ["*.log", "!keep.log", "build/", "/dist", "docs/*.md"])
+
+    assert tree.is_ignored(str(tmp_path / "debug.log"))
+    assert tree.is_ignored(str(tmp_path / "sub" / "debug.log"))
+    assert not tree.is_ignored(str(tmp_path / "keep.log"))
+
+    assert tree.is_ignored(str(tmp_path / "build"), is_dir=True)
+    assert tree.is_ignored(str(tmp_path / "build" / "app.js"))
+    assert not tree.is_ignored(str(tmp_path / "build"))
+
+    assert tree.is_ignored(str(tmp_path / "dist" / "app.js"))
+    assert not tree.is_ignored(str(tmp_path / "sub" / "dist" / "app.js"))
+
+    assert tree.is_ignored(str(tmp_path / "docs" / "index.md"))
+    assert not tree.is_ignored(str(tmp_path / "sub" / "docs" / "index.md"))
+
+
+def test_nested_ignore_files_override_parents(tmp_path):
+    """Test that a deeper ignore file can re-include what a parent ignored."""
+    (tmp_path / "sub").mkdir()
+    (tmp_path / ".gitignore").write_text("*.css\n")
+    (tmp_path / "sub" / ".ignore").write_text("!main.css\n")
+    tree = IgnoreTree.load([str(tmp_path)])
+
+    assert tree.is_ignored(str(tmp_path / "main.css"))
+    assert not tree.is_ignored(str(tmp_path / "sub" / "main.css"))
+    assert tree.is_ignored(str(tmp_path / "sub" / "other.css"))
+
+
+@pytest.fixture
+def app(tmp_path, make_app):
+    static = tmp_path / "static"
+    (static / "node_modules" / "pkg").mkdir(parents=True)
+    (static / "css").mkdir()
+    (static / "js" / "vendor").mkdir(parents=True)
+    (static / ".gitignore").write_text("node_modules/\n")
+
+    return make_app(tmp_path, LiveReload(), LIVERELOAD_USE_GITIGNORE=True)
+
+
+def test_ignored_directories_are_not_scheduled(app, tmp_path):
+    """Test that ignored directories are left out of the observer entirely."""
+    static = tmp_path / "static"
+    assert registry.scheduled == {str(static / "css"), str(static / "js")}
+    assert registry.scheduled_flat == {str(static)}
+
+
+def test_ignored_files_are_filtered(app, tmp_path):
+    """Test that events for ignored files never reach the subscribers."""
+    state = app.extensions["livereload"]
+    subscriber = Subscriber()
+    state.subscribers.add(subscriber)
+    worker = state.worker
+
+    worker.process([
+        FileModifiedEvent(str(tmp_path / "static" / "node_modules" / "pkg" / "a.js")),
+        FileModifiedEvent(str(tmp_path / "static" / "css" / "main.css")),
+    ])
+
+    change = subscriber.queue.get_nowait()
+    assert change.path == str(tmp_path / "static" / "css" / "main.css")
+    assert subscriber.queue.empty()
+
+
+def test_notified_paths_skip_the_ignore_files(app, tmp_path, wait_until):
+    """Test that notify() reports gitignored build output."""
+    state = app.extensions["livereload"]
+    subscriber = Subscriber()
+    state.subscribers.add(subscriber)
+    bundle = tmp_path / "static" / "node_modules" / "pkg" / "a.js"
+    bundle.write_text("")
+
+    state.notify(["static/node_modules/pkg/a.js"])
+
+    assert wait_until(lambda: not subscriber.queue.empty())
+    assert subscriber.queue.get_nowait().path == str(bundle)
+    # Observer events for the same file are still filtered.
+    bundle.write_text("changed")
+    state.worker.process([FileModifiedEvent(str(bundle))])
+    assert subscriber.queue.empty()
+
+
+def test_new_directories_are_planned(app, tmp_path):
+    """Test that created directories update the watches."""
+    static = tmp_path / "static"
+    (static / "vendor").mkdir()
+    (static / ".gitignore").write_text("node_modules/\n/vendor/\n")
+
+    app.extensions["livereload"].worker.process(
+        [DirCreatedEvent(str(static / "vendor"))]
+    )
+
+    assert str(static / "vendor") not in registry.scheduled
+    assert registry.scheduled == {str(static / "css"), str(static / "js")}
+    assert registry.scheduled_flat == {str(static)}
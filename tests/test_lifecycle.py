@@ -0,0 +1,83 @@
+"""
+Pruebas para el cierre ordenado y la liberación de recursos
+"""
+
+import os
+import sys
+import gc
+import contextlib
+import threading
+import time
+import pytest
+from flask_livereload import LiveReload
+from flask_livereload.observer import registry
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+def test_close_wakes_open_streams(tmp_path, make_app):
+    """Test that close() ends SSE streams right away instead of after 30s."""
+    (tmp_path / "templates").mkdir()
+    app = make_app(tmp_path)
+    livereload = LiveReload(app)
+    response = app.test_client().get('/_livereload')
+    stream = iter(response.response)
+    assert next(stream).endswith(b"data: connected\n\n")
+
+    remaining = []
+    reader = threading.Thread(target=lambda: remaining.extend(stream))
+    reader.start()
+    started = time.monotonic()
+    livereload.close()
+    reader.join(timeout=5)
+
+    assert not reader.is_alive()
+    assert time.monotonic() - started < 2
+    assert remaining == []
+    assert len(app.extensions["livereload"].subscribers) == 0
+    assert app.test_client().get('/_livereload').status_code == 503
+
+
+def test_context_manager_closes(tmp_path, make_app):
+    """Test that leaving the with block stops the app."""
+    (tmp_path / "templates").mkdir()
+    app = make_app(tmp_path)
+    with LiveReload(app):
+        assert app.extensions["livereload"].running
+    assert not app.extensions["livereload"].running
+    assert registry.observer is None
+
+
+def test_teardown_hook_stops_the_app(tmp_path, make_app):
+    """Test that the callback passed as teardown stops that app."""
+    (tmp_path / "templates").mkdir()
+    app = make_app(tmp_path)
+    with contextlib.ExitStack() as stack:
+        LiveReload(app, teardown=stack.callback)
+        assert app.extensions["livereload"].running
+    assert not app.extensions["livereload"].running
+    assert registry.observer is None
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="counts fds through /proc"
+)
+def test_resources_return_to_baseline(tmp_path, make_app):
+    """Test that threads and file descriptors are released after close()."""
+    baseline_threads = threading.active_count()
+    baseline_fds = open_fds()
+
+    livereload = LiveReload()
+    for i in range(50):
+        root = tmp_path / str(i)
+        (root / "templates").mkdir(parents=True)
+        livereload.init_app(make_app(root))
+    assert threading.active_count() > baseline_threads
+
+    livereload.close()
+    gc.collect()
+
+    assert threading.active_count() == baseline_threads
+    assert open_fds() == baseline_fds
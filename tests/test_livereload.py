@@ -108,5 +108,18 @@ def test_sse_with_config(client_with_config):
     assert response.mimetype == 'text/event-stream'
 
 
+def test_state_preservation_can_be_disabled(app_with_config):
+    """Test that the injected config carries the state preservation setting."""
+    @app_with_config.route('/form')
+    def form():
+        return "<html><body><input name='q'></body></html>"
+
+    client = app_with_config.test_client()
+    assert b'&quot;preserveState&quot;: true' in client.get('/form').data
+
+    app_with_config.config["LIVERELOAD_PRESERVE_STATE"] = False
+    assert b'&quot;preserveState&quot;: false' in client.get('/form').data
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Pruebas para la actualización in situ del DOM
+"""
+
+import pytest
+from flask_livereload import LiveReload
+from flask_livereload.events import Change
+
+
+@pytest.fixture
+def app(tmp_path, make_app):
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "static").mkdir()
+    return make_app(
+        tmp_path, LiveReload(), LIVERELOAD_WATCH=False, LIVERELOAD_MORPH=True
+    )
+
+
+def test_template_changes_are_morphed(app, tmp_path, read_batch):
+    """Test that batches touching only templates ask for an in-place update."""
+    batch = read_batch(
+        app, [Change("modified", str(tmp_path / "templates" / "index.html"))]
+    )
+    assert batch["morph"] is True
+
+
+def test_asset_changes_reload(app, tmp_path, read_batch):
+    """Test that a batch touching an asset falls back to a full reload."""
+    batch = read_batch(app, [
+        Change("modified", str(tmp_path / "templates" / "index.html")),
+        Change("modified", str(tmp_path / "static" / "app.css")),
+    ])
+    assert "morph" not in batch
+
+
+def test_morph_is_opt_in(app, tmp_path, read_batch):
+    """Test that morphing stays off unless LIVERELOAD_MORPH is set."""
+    app.config['LIVERELOAD_MORPH'] = False
+    batch = read_batch(
+        app, [Change("modified", str(tmp_path / "templates" / "index.html"))]
+    )
+    assert "morph" not in batch
@@ -0,0 +1,98 @@
+"""
+Pruebas para varias aplicaciones con un único observador compartido
+"""
+
+import queue
+import pytest
+from watchdog.events import FileModifiedEvent
+from flask_livereload import LiveReload
+from flask_livereload.observer import registry
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "templates" / "index.html").write_text("<p>hi</p>")
+    return tmp_path
+
+
+def test_factory_apps_share_one_watch(project, make_app):
+    """Test that apps built from one instance share the observer and roots."""
+    livereload = LiveReload()
+    first = make_app(project, livereload)
+    second = make_app(project, livereload)
+    try:
+        assert first.extensions["livereload"] is not second.extensions["livereload"]
+        assert registry.scheduled == {str(project / "templates")}
+        assert registry.observer is not None
+    finally:
+        livereload.stop_watcher()
+
+    assert registry.observer is None
+
+
+def test_factory_app_is_found_outside_a_context(project, make_app):
+    """Test that a single factory-initialized app needs no app= argument."""
+    livereload = LiveReload()
+    make_app(project, livereload)
+    try:
+        livereload.notify(["templates/index.html"])
+        assert livereload.health()["status"] in ("ok", "unknown")
+    finally:
+        livereload.close()
+
+
+def test_several_apps_require_app_argument(project, make_app):
+    """Test that the app must be named when more than one is registered."""
+    livereload = LiveReload()
+    first = make_app(project, livereload)
+    make_app(project, livereload)
+    try:
+        with pytest.raises(RuntimeError, match="app="):
+            livereload.notify(["templates/index.html"])
+        livereload.notify(["templates/index.html"], app=first)
+    finally:
+        livereload.close()
+
+
+def test_events_are_routed_to_containing_roots(tmp_path):
+    """Test that nested roots ride on the outer watch and both get events."""
+    inner = tmp_path / "templates"
+    inner.mkdir()
+    outer_queue, inner_queue = queue.SimpleQueue(), queue.SimpleQueue()
+
+    outer_watch = registry.watch(str(tmp_path), outer_queue)
+    inner_watch = registry.watch(str(inner), inner_queue)
+    try:
+        assert registry.scheduled == {str(tmp_path)}
+
+        registry._handler.dispatch(FileModifiedEvent(str(inner / "index.html")))
+        registry._handler.dispatch(FileModifiedEvent(str(tmp_path / "app.py")))
+        assert outer_queue.qsize() == 2
+        assert inner_queue.qsize() == 1
+
+        registry.unwatch(outer_watch)
+        assert registry.scheduled == {str(inner)}
+    finally:
+        registry.unwatch(outer_watch)
+        registry.unwatch(inner_watch)
+
+
+def test_change_reaches_every_app(project, make_app):
+    """Test that a change under a shared folder reaches each app's subscribers."""
+    livereload = LiveReload()
+    apps = [make_app(project, livereload) for _ in range(2)]
+    responses = [app.test_client().get('/_livereload') for app in apps]
+    try:
+        streams = [iter(response.response) for response in responses]
+        for stream in streams:
+            assert next(stream).endswith(b"data: connected\n\n")
+
+        (project / "templates" / "index.html").write_text("<p>changed</p>")
+
+        for stream in streams:
+            assert b"index.html" in next(stream)
+    finally:
+        for response in responses:
+            response.close()
+        livereload.stop_watcher()
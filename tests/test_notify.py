@@ -0,0 +1,140 @@
+"""
+Pruebas para la API de notificación para herramientas de build externas
+"""
+
+import io
+import pytest
+from flask_livereload import LiveReload
+from flask_livereload.events import Change
+
+
+@pytest.fixture
+def app(tmp_path, make_app):
+    (tmp_path / "static").mkdir()
+    (tmp_path / "static" / "app.css").write_text("body {}")
+    return make_app(
+        tmp_path, LiveReload(), LIVERELOAD_WATCH=False, LIVERELOAD_DEBOUNCE=0.01
+    )
+
+
+@pytest.fixture
+def delivered(app):
+    """Collect the batches the extension broadcasts."""
+    batches = []
+    app.extensions["livereload"].worker.on_change = batches.append
+    return batches
+
+
+def wait_for(worker, batches):
+    worker.stop()
+    worker.join(timeout=1)
+    return batches
+
+
+def test_notify_feeds_the_pipeline(app, delivered, tmp_path):
+    """Test that notify() reports changes without a file watcher."""
+    livereload = app.extensions["livereload"]
+    assert livereload.watches == []
+
+    livereload.notify(["static/app.css"])
+
+    assert wait_for(livereload.worker, delivered) == [
+        [Change("modified", str(tmp_path / "static" / "app.css"))]
+    ]
+
+
+def test_notify_rejects_unknown_kind(app):
+    """Test that unsupported change kinds are rejected."""
+    with pytest.raises(ValueError):
+        app.extensions["livereload"].notify(["static/app.css"], "renamed")
+
+
+def test_notify_accepts_a_single_path(app, delivered, tmp_path):
+    """Test that a bare string is one path, not a list of characters."""
+    livereload = app.extensions["livereload"]
+    livereload.notify("static/app.css")
+
+    assert wait_for(livereload.worker, delivered) == [
+        [Change("modified", str(tmp_path / "static" / "app.css"))]
+    ]
+
+
+def test_notify_requires_a_running_watcher(app, tmp_path):
+    """Test that notifying a stopped watcher fails instead of being lost."""
+    livereload = app.extensions["livereload"]
+    livereload.stop()
+
+    with pytest.raises(RuntimeError):
+        livereload.notify(["static/app.css"])
+    response = app.test_client().post(
+        '/_livereload/notify', json={"paths": [str(tmp_path / "static" / "app.css")]}
+    )
+    assert response.status_code == 503
+
+
+def test_notify_endpoint(app, delivered, tmp_path):
+    """Test that local clients can notify changes over HTTP."""
+    client = app.test_client()
+    css = str(tmp_path / "static" / "app.css")
+
+    response = client.post('/_livereload/notify', json={"paths": [css]})
+    assert response.status_code == 202
+    assert response.get_json() == {"queued": 1}
+
+    assert client.post('/_livereload/notify', json={"paths": css}).status_code == 400
+    remote = client.post(
+        '/_livereload/notify',
+        json={"paths": [css]},
+        environ_base={"REMOTE_ADDR": "10.0.0.2"},
+    )
+    assert remote.status_code == 403
+
+    assert wait_for(app.extensions["livereload"].worker, delivered) == [
+        [Change("modified", css)]
+    ]
+
+
+@pytest.mark.parametrize(
+    "addr, allowed",
+    [
+        ("127.0.0.1", True),
+        ("127.0.1.1", True),
+        ("::1", True),
+        ("::ffff:127.0.0.1", True),
+        ("10.0.0.2", False),
+        ("::ffff:10.0.0.2", False),
+        ("", False),
+    ],
+)
+def test_notify_accepts_any_loopback_address(app, tmp_path, addr, allowed):
+    """Test that dual-stack and 127/8 loopback clients may notify."""
+    response = app.test_client().post(
+        '/_livereload/notify',
+        json={"paths": [str(tmp_path / "static" / "app.css")]},
+        environ_base={"REMOTE_ADDR": addr},
+    )
+    assert (response.status_code == 202) == allowed
+
+
+def test_trigger_command(app, monkeypatch, tmp_path):
+    """Test that `flask livereload trigger` posts to the notify endpoint."""
+    client = app.test_client()
+
+    def urlopen(request, timeout):
+        response = client.post(
+            '/_livereload/notify',
+            data=request.data,
+            content_type=request.headers["Content-type"],
+        )
+        assert request.full_url == "http://127.0.0.1:5000/_livereload/notify"
+        return io.BytesIO(response.data)
+
+    monkeypatch.setattr("urllib.request.urlopen", urlopen)
+    monkeypatch.chdir(tmp_path)
+
+    result = app.test_cli_runner().invoke(
+        args=["livereload", "trigger", "static/app.css", "--kind", "created"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Notified 1 change(s)." in result.output
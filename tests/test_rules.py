@@ -0,0 +1,114 @@
+"""
+Pruebas para las reglas de acción por ruta
+"""
+
+import time
+import queue
+import pytest
+from flask import render_template
+from watchdog.events import FileModifiedEvent
+from flask_livereload import LiveReload
+from flask_livereload.events import Change
+from flask_livereload.rules import Router
+from flask_livereload.subscribers import Subscriber
+from flask_livereload.worker import ChangeWorker
+
+RULES = [
+    ("static/dist/*", "build"),
+    ("*.css", "css"),
+    ("templates/mail/*", "evict"),
+    ("*.map", "ignore"),
+    ("templates/cart/*", "event:cart-changed"),
+]
+
+
+def test_first_matching_rule_wins(tmp_path):
+    """Test that rules match relative paths in order and default to reload."""
+    router = Router(str(tmp_path), RULES)
+    assert router.action_for(str(tmp_path / "static" / "dist" / "app.css")) == "build"
+    assert router.action_for(str(tmp_path / "static" / "app.css")) == "css"
+    assert router.action_for(str(tmp_path / "templates" / "cart" / "row.html")) == (
+        "event:cart-changed"
+    )
+    assert router.action_for(str(tmp_path / "templates" / "index.html")) == "reload"
+
+
+def test_cheapest_correct_action(tmp_path):
+    """Test that actions degrade to a reload where they would be wrong."""
+    router = Router(str(tmp_path), RULES)
+    css = str(tmp_path / "static" / "app.css")
+    assert router.action(Change("modified", css)) == "css"
+    assert router.action(Change("deleted", css)) == "reload"
+    assert router.action(Change("moved", css, css + ".bak")) == "reload"
+    build = str(tmp_path / "static" / "dist" / "a.js")
+    assert router.action(Change("modified", build)) == "reload"
+
+
+def test_unknown_action_is_rejected(tmp_path):
+    """Test that a typo in an action fails at start instead of reloading."""
+    with pytest.raises(ValueError):
+        Router(str(tmp_path), [("*.css", "hotswap")])
+
+
+def test_build_output_waits_until_quiet(tmp_path):
+    """Test that build output is reported once, after the build settles."""
+    batches = []
+    worker = ChangeWorker(
+        queue.SimpleQueue(),
+        batches.append,
+        [],
+        [],
+        debounce=0.01,
+        router=Router(str(tmp_path), RULES),
+        settle=0.2,
+    )
+    worker.start()
+    (tmp_path / "static" / "dist").mkdir(parents=True)
+    for name in ("a.js", "b.js", "c.js"):
+        (tmp_path / "static" / "dist" / name).write_text(name)
+        worker.events.put(FileModifiedEvent(str(tmp_path / "static" / "dist" / name)))
+        time.sleep(0.1)
+    (tmp_path / "static" / "app.js.map").write_text("{}")
+    worker.events.put(FileModifiedEvent(str(tmp_path / "static" / "app.js.map")))
+    time.sleep(0.4)
+    worker.stop()
+    worker.join(timeout=1)
+
+    assert len(batches) == 1
+    assert len(batches[0]) == 3
+
+
+@pytest.fixture
+def app(tmp_path, make_app):
+    (tmp_path / "templates" / "mail").mkdir(parents=True)
+    (tmp_path / "templates" / "mail" / "welcome.html").write_text("hi")
+    (tmp_path / "static").mkdir()
+    return make_app(
+        tmp_path, LiveReload(), LIVERELOAD_WATCH=False, LIVERELOAD_RULES=RULES
+    )
+
+
+def test_evict_only_drops_the_cached_template(app, tmp_path):
+    """Test that evict rules clear the Jinja cache without notifying pages."""
+    with app.app_context():
+        render_template("mail/welcome.html")
+    assert any(key[1] == "mail/welcome.html" for key in app.jinja_env.cache.keys())
+
+    state = app.extensions["livereload"]
+    subscriber = Subscriber()
+    state.subscribers.add(subscriber)
+    state.broadcast([
+        Change("modified", str(tmp_path / "templates" / "mail" / "welcome.html"))
+    ])
+
+    assert not any(key[1] == "mail/welcome.html" for key in app.jinja_env.cache.keys())
+    assert subscriber.queue.empty()
+
+
+def test_actions_are_sent_to_the_page(app, tmp_path, read_batch):
+    """Test that non-reload actions travel with their change."""
+    changes = read_batch(app, [
+        Change("modified", str(tmp_path / "static" / "app.css")),
+        Change("modified", str(tmp_path / "templates" / "cart" / "row.html")),
+    ])["changes"]
+    assert [change.get("action") for change in changes] == ["css", "event:cart-changed"]
@@ -0,0 +1,202 @@
+"""
+Pruebas para el filtrado de cambios por suscriptor
+"""
+
+import os
+import pytest
+from flask import render_template
+from flask_livereload import LiveReload
+from flask_livereload.events import Change
+from flask_livereload.subscribers import (
+    Subscriber,
+    SubscriberIndex,
+    normalize_path,
+    resolve_subscription,
+)
+
+
+@pytest.fixture
+def app(tmp_path, make_app):
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "static").mkdir()
+    (tmp_path / "templates" / "base.html").write_text(
+        "<html><body>{% block body %}{% endblock %}</body></html>"
+    )
+    (tmp_path / "templates" / "index.html").write_text(
+        '{% extends "base.html" %}{% block body %}Hi{% endblock %}'
+    )
+    (tmp_path / "static" / "app.css").write_text("body {}")
+
+    app = make_app(tmp_path, LiveReload())
+
+    @app.route('/')
+    def index():
+        return render_template("index.html")
+
+    return app
+
+
+def test_index_routes_to_declared_subscribers():
+    """Test that a change only reaches the pages that use the file."""
+    index = SubscriberIndex()
+    css_page = Subscriber(["/srv/static/a.css"])
+    other_page = Subscriber(["/srv/static/b.css"])
+    wildcard = Subscriber()
+    for subscriber in (css_page, other_page, wildcard):
+        index.add(subscriber)
+
+    assert index.match(["/srv/static/a.css"]) == {css_page, wildcard}
+    assert index.match(["/srv/static/b.css"]) == {other_page, wildcard}
+
+    index.remove(css_page)
+    assert index.match(["/srv/static/b.css"]) == {other_page, wildcard}
+    assert len(index) == 2
+
+
+def test_index_broadcasts_unknown_paths():
+    """Test that changes nobody declared are delivered to everyone."""
+    index = SubscriberIndex()
+    first = Subscriber(["/srv/static/a.css"])
+    second = Subscriber(["/srv/static/b.css"])
+    index.add(first)
+    index.add(second)
+
+    assert index.match(["/srv/static/imported.css"]) == {first, second}
+
+
+def test_undeclared_templates_only_reach_wildcards(app, tmp_path):
+    """Test that a template no page rendered is not sent to every page."""
+    state = app.extensions["livereload"]
+    page = Subscriber([str(tmp_path / "templates" / "index.html")])
+    wildcard = Subscriber()
+    state.subscribers.add(page)
+    state.subscribers.add(wildcard)
+    unused = Change("modified", str(tmp_path / "templates" / "unused.html"))
+    imported = Change("modified", str(tmp_path / "static" / "imported.css"))
+
+    state.broadcast([unused])
+    assert page.queue.empty()
+    assert wildcard.queue.get_nowait() == unused
+
+    state.broadcast([imported])
+    assert page.queue.get_nowait() == imported
+    assert wildcard.queue.get_nowait() == imported
+
+
+def test_index_enforces_max_subscribers():
+    """Test that connections beyond the limit are refused."""
+    index = SubscriberIndex(max_subscribers=1)
+    assert index.add(Subscriber())
+    assert index.is_full
+    assert not index.add(Subscriber())
+    assert len(index) == 1
+
+
+def test_sse_refuses_connections_beyond_limit(app):
+    """Test that the endpoint answers 503 once the limit is reached."""
+    app.extensions["livereload"].subscribers.max_subscribers = 1
+    client = app.test_client()
+    with client.get('/_livereload') as first:
+        next(first.response)
+        assert client.get('/_livereload').status_code == 503
+
+
+def test_slow_clients_are_evicted(app, tmp_path):
+    """Test that a client past the buffer high-water mark is dropped."""
+    app.config["LIVERELOAD_SUBSCRIBER_BUFFER"] = 2
+    state = app.extensions["livereload"]
+    slow = Subscriber()
+    state.subscribers.add(slow)
+    css = str(tmp_path / "static" / "app.css")
+
+    state.broadcast([Change("modified", css)])
+    state.broadcast([Change("modified", css)])
+    assert len(state.subscribers) == 1
+
+    state.broadcast([Change("modified", css)])
+    assert len(state.subscribers) == 0
+    assert slow.queue.qsize() == 2  # only the reload and close sentinels are left
+
+
+def test_stalled_clients_are_evicted(app, tmp_path):
+    """Test that a client that has not read anything for too long is dropped."""
+    app.config["LIVERELOAD_CLIENT_TIMEOUT"] = 0
+    state = app.extensions["livereload"]
+    stalled = Subscriber()
+    state.subscribers.add(stalled)
+    css = str(tmp_path / "static" / "app.css")
+
+    state.broadcast([Change("modified", css)])
+    assert len(state.subscribers) == 1
+    state.broadcast([Change("modified", css)])
+    assert len(state.subscribers) == 0
+
+
+def test_evicted_clients_are_told_to_reload(app, tmp_path):
+    """Test that eviction ends the stream with a reload and marks the reconnect."""
+    state = app.extensions["livereload"]
+    client = app.test_client()
+    with client.get('/_livereload') as response:
+        stream = iter(response.response)
+        connected = next(stream).decode()
+        (subscriber,) = state.subscribers.match([])
+        state.subscribers.evict(subscriber)
+        final = next(stream).decode()
+        assert list(stream) == []
+
+    assert '"stale":true' in final
+    last_event_id = connected.split("id: ", 1)[1].split("\n", 1)[0]
+    with client.get(
+        '/_livereload', headers={"Last-Event-ID": last_event_id}
+    ) as response:
+        stream = iter(response.response)
+        next(stream)
+        assert '"stale":true' in next(stream).decode()
+
+    # The marker is used up by the reconnect.
+    assert not state.subscribers.was_evicted(subscriber.id)
+
+
+def test_client_timeout_must_exceed_keepalive(make_app):
+    """Test that a timeout that would evict idle tabs is rejected."""
+    app = make_app(
+        LIVERELOAD_WATCH=False, LIVERELOAD_KEEPALIVE=5, LIVERELOAD_CLIENT_TIMEOUT=1
+    )
+    with pytest.raises(ValueError, match="LIVERELOAD_CLIENT_TIMEOUT"):
+        LiveReload(app)
+
+
+def test_resolve_subscription_follows_extends(app, tmp_path):
+    """Test that assets and template layouts are resolved to files."""
+    with app.test_request_context('/'):
+        adapter = app.url_map.bind_to_environ({
+            "SERVER_NAME": "localhost", "SERVER_PORT": "80",
+            "wsgi.url_scheme": "http", "REQUEST_METHOD": "GET",
+        })
+        paths = resolve_subscription(
+            app, adapter, ["/static/app.css", "/nowhere.js"], ["index.html"]
+        )
+
+    assert {normalize_path(p) for p in paths} == {
+        normalize_path(tmp_path / "static" / "app.css"),
+        normalize_path(tmp_path / "templates" / "index.html"),
+        normalize_path(tmp_path / "templates" / "base.html"),
+    }
+
+
+def test_rendered_templates_are_injected(app):
+    """Test that the injected script knows which templates were rendered."""
+    response = app.test_client().get('/')
+    assert b'index.html' in response.data
+
+
+def test_sse_subscribes_declared_paths(app, tmp_path):
+    """Test that connecting registers the page under the files it uses."""
+    livereload = app.extensions["livereload"]
+    client = app.test_client()
+    with client.get('/_livereload?template=index.html') as response:
+        next(response.response)
+        base = os.path.join(str(tmp_path), "templates", "base.html")
+        assert len(livereload.subscribers.match([base])) == 1
+        livereload.broadcast([Change("modified", base)])
+        assert b'base.html' in next(response.response)
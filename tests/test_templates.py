@@ -0,0 +1,71 @@
+"""
+Pruebas para el precalentamiento de plantillas
+"""
+
+import pytest
+from flask_livereload import LiveReload
+from flask_livereload.events import Change
+from flask_livereload.templates import template_name
+
+
+@pytest.fixture
+def app(tmp_path, make_app):
+    templates = tmp_path / "templates"
+    (templates / "partials").mkdir(parents=True)
+    (templates / "base.html").write_text(
+        "<html><body>{% block body %}{% endblock %}</body></html>"
+    )
+    (templates / "partials" / "nav.html").write_text("<nav></nav>")
+    (templates / "index.html").write_text(
+        '{% extends "base.html" %}'
+        '{% block body %}{% include "partials/nav.html" %}{% endblock %}'
+    )
+    (templates / "about.html").write_text("<p>about</p>")
+
+    return make_app(
+        tmp_path,
+        LiveReload(),
+        LIVERELOAD_WATCH=False,
+        LIVERELOAD_PREWARM_TEMPLATES=True,
+    )
+
+
+def test_template_name(app, tmp_path):
+    """Test that template files map to their loader names."""
+    nav = tmp_path / "templates" / "partials" / "nav.html"
+    assert template_name(app, str(nav)) == "partials/nav.html"
+    assert template_name(app, str(tmp_path / "static" / "app.css")) is None
+
+
+def test_prewarm_compiles_dependents(app, tmp_path):
+    """Test that a changed partial and the pages using it are compiled."""
+    prewarmer = app.extensions["livereload"].prewarmer
+    nav = str(tmp_path / "templates" / "partials" / "nav.html")
+
+    compiled = prewarmer.prewarm([Change("modified", nav)])
+
+    assert compiled == {"partials/nav.html", "index.html"}
+    assert len(app.jinja_env.cache) == 2
+
+
+def test_prewarm_runs_before_broadcast(app, tmp_path):
+    """Test that broadcasting a template change compiles it."""
+    state = app.extensions["livereload"]
+    base = tmp_path / "templates" / "base.html"
+    base.write_text("<html><body>{% block body %}{% endblock %}!</body></html>")
+
+    state.broadcast([Change("modified", str(base))])
+
+    with app.app_context():
+        template = app.jinja_env.get_template("base.html")
+    assert template.is_up_to_date
+    assert "!" in template.render()
+
+
+def test_prewarm_survives_syntax_errors(app, tmp_path):
+    """Test that half-written templates do not break the broadcast."""
+    about = tmp_path / "templates" / "about.html"
+    about.write_text("{% if %}")
+    prewarmer = app.extensions["livereload"].prewarmer
+
+    assert prewarmer.prewarm([Change("modified", str(about))]) == set()
@@ -0,0 +1,162 @@
+"""
+Pruebas para la recarga escalonada por oleadas
+"""
+
+import time
+from flask_livereload import LiveReload
+from flask_livereload.events import Change
+from flask_livereload.subscribers import Subscriber
+from flask_livereload.waves import WaveBroadcaster
+
+CHANGE = Change("modified", "/srv/templates/index.html")
+
+
+def test_waves_wait_for_acks(wait_until):
+    """Test that the next wave only goes out once the previous one reloaded."""
+    broadcaster = WaveBroadcaster(wave_size=2, timeout=10)
+    subscribers = [Subscriber() for _ in range(5)]
+    sent = []
+
+    broadcaster.deliver(
+        {s: [CHANGE] for s in subscribers},
+        lambda subscriber, batch: sent.append(subscriber),
+        lambda subscriber: True,
+    )
+
+    assert wait_until(lambda: len(sent) == 2)
+    time.sleep(0.05)
+    assert len(sent) == 2
+
+    for subscriber in sent[:2]:
+        assert broadcaster.ack(subscriber.id)
+    assert wait_until(lambda: len(sent) == 4)
+
+    for subscriber in sent[2:4]:
+        broadcaster.ack(subscriber.id)
+    assert wait_until(lambda: len(sent) == 5)
+    assert set(sent) == set(subscribers)
+
+
+def test_waves_move_on_after_timeout(wait_until):
+    """Test that missing acknowledgements only delay the next wave."""
+    broadcaster = WaveBroadcaster(wave_size=1, timeout=0.05)
+    subscribers = [Subscriber() for _ in range(3)]
+    sent = []
+
+    broadcaster.deliver(
+        {s: [CHANGE] for s in subscribers},
+        lambda subscriber, batch: sent.append(subscriber),
+        lambda subscriber: True,
+    )
+
+    assert wait_until(lambda: len(sent) == 3)
+    assert not broadcaster.ack(subscribers[0].id)
+
+
+def test_bound_holds_across_broadcasts(wait_until):
+    """Test that back-to-back broadcasts share the slots and merge per client."""
+    broadcaster = WaveBroadcaster(wave_size=1, timeout=10)
+    first, second = Subscriber(), Subscriber()
+    other = Change("modified", "/srv/static/app.css")
+    sent = []
+
+    def send(subscriber, batch):
+        sent.append((subscriber, list(batch)))
+
+    broadcaster.deliver({first: [CHANGE], second: [CHANGE]}, send, lambda s: True)
+    broadcaster.deliver({first: [other], second: [other]}, send, lambda s: True)
+    time.sleep(0.05)
+    assert sent == [(first, [CHANGE])]
+
+    assert broadcaster.ack(first.id)
+    assert wait_until(lambda: len(sent) == 2)
+    assert sent[1] == (second, [CHANGE, other])
+
+    assert broadcaster.ack(second.id)
+    assert wait_until(lambda: len(sent) == 3)
+    assert sent[2] == (first, [other])
+    broadcaster.close()
+
+
+def test_reloading_tabs_keep_their_slot(make_app, wait_until):
+    """Test that tabs disconnecting to reload still count until they ack."""
+    app = make_app(
+        None,
+        LiveReload(),
+        LIVERELOAD_WATCH=False,
+        LIVERELOAD_WAVE_SIZE=2,
+        LIVERELOAD_WAVE_TIMEOUT=10,
+    )
+    state = app.extensions["livereload"]
+    subscribers = [Subscriber() for _ in range(6)]
+    for subscriber in subscribers:
+        state.subscribers.add(subscriber)
+
+    def sent():
+        return [s for s in subscribers if not s.queue.empty()]
+
+    state.broadcast([CHANGE])
+    assert len(sent()) == 2
+    # Both tabs reload: their streams end and they leave the index.
+    reloading = sent()
+    for subscriber in reloading:
+        state.subscribers.remove(subscriber)
+
+    assert state.waves.ack(reloading[0].id)
+    assert wait_until(lambda: len(sent()) == 3)
+    time.sleep(0.05)
+    assert len(sent()) == 3
+
+    state.broadcast([CHANGE])
+    time.sleep(0.05)
+    assert len(sent()) == 3
+
+
+def test_small_broadcasts_are_not_staggered():
+    """Test that broadcasts within one wave are sent synchronously."""
+    broadcaster = WaveBroadcaster(wave_size=10, timeout=10)
+    sent = []
+    broadcaster.deliver(
+        {Subscriber(): [CHANGE]}, lambda s, batch: sent.append(s), lambda s: True
+    )
+    assert len(sent) == 1
+
+
+def test_waves_survive_restart(make_app, wait_until):
+    """Test that staggered delivery still works after stop/start."""
+    livereload = LiveReload()
+    app = make_app(
+        None,
+        livereload,
+        LIVERELOAD_WATCH=False,
+        LIVERELOAD_WAVE_SIZE=1,
+        LIVERELOAD_WAVE_TIMEOUT=0.05,
+    )
+    livereload.stop_watcher(app)
+    livereload.start_watcher(app)
+
+    state = app.extensions["livereload"]
+    subscribers = [Subscriber() for _ in range(3)]
+    for subscriber in subscribers:
+        state.subscribers.add(subscriber)
+    state.broadcast([CHANGE])
+
+    assert wait_until(lambda: all(s.queue.qsize() == 1 for s in subscribers))
+
+
+def test_reload_carries_client_and_delay(make_app, read_batch):
+    """Test that staggered reloads tell the client who it is and how long to wait."""
+    app = make_app(
+        None,
+        LiveReload(),
+        LIVERELOAD_WATCH=False,
+        LIVERELOAD_WAVE_SIZE=1,
+        LIVERELOAD_RELOAD_JITTER=500,
+    )
+    client = app.test_client()
+    batch = read_batch(app, [CHANGE])
+    subscriber_id = batch["client"]
+    assert 0 <= batch["delay"] <= 500
+    response = client.post('/_livereload/ack', json={"client": subscriber_id})
+    assert response.status_code == 204
+    assert client.post('/_livereload/ack', json={}).status_code == 400